@@ -23,8 +23,6 @@ Source: knowledge/exchanges/greeks_definitions.md
 from typing import Literal, Union, Tuple
 import logging
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -323,6 +321,9 @@ def deribit_to_btc(deribit_value: float, btc_price: float, greek_type: GreekType
 
 # Example usage
 if __name__ == "__main__":
+    # Configure logging only when run as a script; importers (e.g. qkb) own their logging setup.
+    logging.basicConfig(level=logging.INFO)
+
     # Example: Convert OKX PA to USD
     print("=" * 80)
     print("GREEKS CONVERTER EXAMPLES")
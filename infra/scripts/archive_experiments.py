@@ -0,0 +1,489 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime as dt
+import functools
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, TextIO
+
+
+LOGGER = logging.getLogger("archive_experiments")
+
+
+ARCHIVE_DIRNAME = "_archive"
+MANIFEST_NAME = "ARCHIVE_MANIFEST.json"
+STAGING_PREFIX = ".staging-"
+PARTIAL_SUFFIX = ".partial.json"
+
+
+# Regenerable clutter only. Logs, configs and non-CSV results are kept as-is
+# (agent-rules/11_file_hygiene.md: never delete experiments, only archive them).
+INTERMEDIATE_DIRS = {"__pycache__", ".ipynb_checkpoints", ".pytest_cache"}
+INTERMEDIATE_SUFFIXES = {".pyc", ".tmp"}
+
+
+EXPERIMENT_DATE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})")
+
+
+def _configure_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+
+def _have_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Transparent read access (used by preflight_backtest and indexers)
+# ---------------------------------------------------------------------------
+
+
+class _ParquetCsvStream(io.TextIOBase):
+    """
+    Read-only text stream rendering a parquet file as CSV, one record batch at a time,
+    so csv.reader scans of multi-GB archived results stay streaming.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 65536) -> None:
+        import pyarrow.parquet as pq
+
+        super().__init__()
+        self._pf = pq.ParquetFile(path)
+        self._lines = self._iter_lines(batch_size)
+
+    def _iter_lines(self, batch_size: int):
+        buf = io.StringIO()
+        writer = csv.writer(buf, lineterminator="\n")
+        writer.writerow(self._pf.schema_arrow.names)
+        yield buf.getvalue()
+        for batch in self._pf.iter_batches(batch_size=batch_size):
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            writer.writerows(zip(*(col.to_pylist() for col in batch.columns)))
+            yield from io.StringIO(buf.getvalue(), newline="").readlines()
+
+    def readable(self) -> bool:
+        return True
+
+    def readline(self, size: int = -1) -> str:
+        return next(self._lines, "")
+
+    def read(self, size: int = -1) -> str:
+        return "".join(self._lines)
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def close(self) -> None:
+        self._lines = iter(())
+        super().close()
+
+
+class ResultReadError(ValueError):
+    """A result exists but can't be read here (e.g. archived parquet without pyarrow)."""
+
+
+@functools.lru_cache(maxsize=64)
+def _stored_names(manifest_path: Path) -> dict[str, str]:
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except ValueError as e:
+        raise ResultReadError(f"{manifest_path}: {e}") from None
+    return {f["original"]: f["stored"] for f in manifest.get("files", []) if "stored" in f}
+
+
+def _archived_copy(path: Path) -> Path | None:
+    for experiment_dir in path.parents:
+        manifest_path = experiment_dir / MANIFEST_NAME
+        if manifest_path.is_file():
+            stored = _stored_names(manifest_path).get(path.relative_to(experiment_dir).as_posix())
+            return experiment_dir / stored if stored is not None else None
+    return None
+
+
+def resolve_result_path(path: Path) -> Path | None:
+    """
+    Locate a results CSV. Only inside an archived experiment (ARCHIVE_MANIFEST.json present)
+    does a missing <name>.csv resolve to the compacted copy the manifest lists for it; a
+    native nav.parquet in a live experiment never stands in for nav.csv.
+    """
+    if path.exists():
+        return path
+    stored = _archived_copy(path)
+    return stored if stored is not None and stored.exists() else None
+
+
+def open_result_csv(path: Path) -> TextIO:
+    """
+    Open a results CSV as text, whether it is plain or archived as gzip / parquet.
+    Parquet is rendered back to CSV batch by batch; without pyarrow it raises ResultReadError.
+    """
+    resolved = resolve_result_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"Result not found: {path}")
+    if resolved.suffix == ".gz":
+        return gzip.open(resolved, "rt", encoding="utf-8", newline="")
+    if resolved.suffix == ".parquet":
+        if not _have_pyarrow():
+            raise ResultReadError(f"{resolved} is archived as parquet; reading it needs pyarrow")
+        return _ParquetCsvStream(resolved)
+    return resolved.open("r", encoding="utf-8", newline="")
+
+
+def load_manifest(experiment_dir: Path) -> dict[str, Any] | None:
+    manifest_path = experiment_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+
+def experiment_date(experiment_dir: Path) -> dt.date:
+    m = EXPERIMENT_DATE_RE.match(experiment_dir.name)
+    if m:
+        try:
+            return dt.date.fromisoformat(m.group(1))
+        except ValueError:
+            pass
+    return dt.date.fromtimestamp(experiment_dir.stat().st_mtime)
+
+
+def preflight_failed(experiment_dir: Path) -> bool:
+    report = experiment_dir / "results" / "preflight_report.json"
+    if not report.exists():
+        return False
+    try:
+        return not json.loads(report.read_text(encoding="utf-8")).get("ok", True)
+    except Exception:
+        return False
+
+
+def select_candidates(
+    experiments_root: Path,
+    cutoff: dt.date | None,
+    include_failed: bool,
+) -> list[tuple[Path, str]]:
+    """
+    Return [(experiment_dir, reason)] for experiments eligible for archival.
+    """
+    candidates: list[tuple[Path, str]] = []
+    for child in sorted(experiments_root.iterdir()):
+        if not child.is_dir() or child.name.startswith((".", "_")):
+            continue
+        if cutoff is not None and experiment_date(child) < cutoff:
+            candidates.append((child, f"older_than:{cutoff.isoformat()}"))
+        elif include_failed and preflight_failed(child):
+            candidates.append((child, "preflight_failed"))
+    return candidates
+
+
+# ---------------------------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------------------------
+
+
+def _compact_csv_gzip(src: Path, dst: Path) -> dict[str, Any]:
+    with src.open("rb") as fin, gzip.open(dst, "wb", compresslevel=6) as fout:
+        shutil.copyfileobj(fin, fout, length=1 << 20)
+    # Verify lossless round-trip before the staged copy is trusted.
+    h = hashlib.sha256()
+    with gzip.open(dst, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return {"format": "csv.gz", "roundtrip_sha256": h.hexdigest()}
+
+
+def _compact_csv_parquet(src: Path, dst: Path) -> dict[str, Any]:
+    """
+    Every column is stored as a string (no type inference: "00123", "N/A" and timestamp
+    text survive as-is), then the parquet is re-read and compared cell by cell.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+
+    with src.open("r", encoding="utf-8", newline="") as f:
+        header = next(csv.reader(f), [])
+    if not header or len(set(header)) != len(header):
+        raise ValueError(f"empty or duplicate column names: {header}")
+
+    reader = pacsv.open_csv(
+        src,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in header},
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+    rows = 0
+    with pq.ParquetWriter(dst, reader.schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+
+    with src.open("r", encoding="utf-8", newline="") as fa, _ParquetCsvStream(dst) as fb:
+        for a, b in itertools.zip_longest(csv.reader(fa), csv.reader(fb)):
+            if a != b:
+                raise ValueError(f"cell mismatch after parquet round-trip: {a!r} != {b!r}")
+    return {"format": "parquet", "rows": rows, "verified": "cells"}
+
+
+def _unclaimed(dst: Path) -> Path:
+    """dst, unless an earlier file of the experiment was already staged under that name."""
+    if dst.exists():
+        raise FileExistsError(f"Archive name clash: {dst.name} would overwrite another file of the experiment")
+    return dst
+
+
+def compact_csv(src: Path, dst_dir: Path, fmt: str) -> tuple[Path, dict[str, Any]]:
+    """
+    Write a verified compressed copy of src into dst_dir; src is not modified.
+    Parquet falls back to byte-verified gzip whenever an exact round-trip can't be shown.
+    """
+    info: dict[str, Any] = {}
+    if fmt == "parquet":
+        # nav.csv -> nav.csv.parquet: never the name of a native results/*.parquet.
+        dst = _unclaimed(dst_dir / (src.name + ".parquet"))
+        try:
+            return dst, _compact_csv_parquet(src, dst)
+        except Exception as e:
+            dst.unlink(missing_ok=True)
+            info = {"parquet_fallback": f"{type(e).__name__}: {e}"[:300]}
+
+    dst = _unclaimed(dst_dir / (src.name + ".gz"))
+    gz_info = _compact_csv_gzip(src, dst)
+    if gz_info.pop("roundtrip_sha256") != _sha256(src):
+        raise RuntimeError(f"Compaction verification failed: {src}")
+    return dst, {**gz_info, "verified": "sha256", **info}
+
+
+def _is_intermediate(path: Path) -> bool:
+    return path.name in INTERMEDIATE_DIRS if path.is_dir() else path.suffix in INTERMEDIATE_SUFFIXES
+
+
+def stage_experiment(
+    experiment_dir: Path, staging_dir: Path, fmt: str, dropped: list[str], entries: list[dict[str, Any]]
+) -> None:
+    """
+    Build the archived copy of experiment_dir in staging_dir: CSVs compacted, regenerable
+    clutter left out, everything else copied. Every staged file gets a manifest entry with
+    both checksums. experiment_dir itself is only read.
+    Progress is appended to dropped/entries as it happens, so a failure can still be reported.
+    """
+    staging_dir.mkdir(parents=True)
+    (staging_dir / MANIFEST_NAME).touch()  # reserved: a same-named source file is a clash
+    for src in sorted(experiment_dir.rglob("*")):
+        rel = src.relative_to(experiment_dir)
+        if any(part in INTERMEDIATE_DIRS for part in rel.parts[:-1]):
+            continue  # inside an intermediate dir that was already dropped
+        if _is_intermediate(src):
+            dropped.append(rel.as_posix())
+            continue
+        dst_dir = staging_dir / rel.parent
+        if src.is_dir():
+            (staging_dir / rel).mkdir(parents=True, exist_ok=True)
+            continue
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        src_sha = _sha256(src)
+        if src.suffix == ".csv":
+            dst, info = compact_csv(src, dst_dir, fmt)
+            dst_sha = _sha256(dst)
+        else:
+            dst = _unclaimed(dst_dir / src.name)
+            shutil.copy2(src, dst)
+            dst_sha = _sha256(dst)
+            if dst_sha != src_sha:
+                raise RuntimeError(f"Copy verification failed: {src}")
+            info = {"format": "copy", "verified": "sha256"}
+        entries.append(
+            {
+                "original": rel.as_posix(),
+                "stored": dst.relative_to(staging_dir).as_posix(),
+                "original_sha256": src_sha,
+                "stored_sha256": dst_sha,
+                "original_bytes": src.stat().st_size,
+                "stored_bytes": dst.stat().st_size,
+                **info,
+            }
+        )
+
+
+def verify_staged(staging_dir: Path, entries: list[dict[str, Any]]) -> None:
+    """Re-hash every staged file against its manifest entry; anything off aborts the archive."""
+    for entry in entries:
+        stored = staging_dir / entry["stored"]
+        if stored.stat().st_size != entry["stored_bytes"] or _sha256(stored) != entry["stored_sha256"]:
+            raise RuntimeError(f"Staged file does not match its manifest entry: {entry['stored']}")
+
+
+def archive_experiment(experiment_dir: Path, archive_root: Path, reason: str, fmt: str) -> dict[str, Any]:
+    """
+    Archive one experiment. The compacted copy and its manifest are built in a staging dir
+    under archive_root and renamed into place only when everything succeeded; the live
+    experiment is removed last, so a failure at any step leaves it untouched.
+    Runs in a worker process; returns the manifest.
+    """
+    target = archive_root / experiment_dir.name
+    if target.exists():
+        raise FileExistsError(f"Archive target already exists: {target}")
+    staging = archive_root / f"{STAGING_PREFIX}{experiment_dir.name}"
+    if staging.exists():
+        shutil.rmtree(staging)  # leftover from an interrupted run; the source is still intact
+
+    archive_root.mkdir(parents=True, exist_ok=True)
+    files: list[dict[str, Any]] = []
+    manifest: dict[str, Any] = {
+        "experiment": experiment_dir.name,
+        "original_path": str(experiment_dir),
+        "archived_path": str(target),
+        "archived_at": dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds"),
+        "reason": reason,
+        "dropped_intermediates": [],
+        "files": files,
+    }
+    try:
+        stage_experiment(experiment_dir, staging, fmt, manifest["dropped_intermediates"], files)
+        verify_staged(staging, files)
+        manifest["original_bytes"] = sum(f["original_bytes"] for f in files)
+        manifest["stored_bytes"] = sum(f["stored_bytes"] for f in files)
+        (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(staging, target)
+    except BaseException as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        # Nothing was archived and the experiment is untouched; record how far staging got.
+        partial = {**manifest, "status": "failed", "error": f"{type(e).__name__}: {e}"[:300]}
+        partial_path = archive_root / f"{experiment_dir.name}{PARTIAL_SUFFIX}"
+        partial_path.write_text(json.dumps(partial, indent=2), encoding="utf-8")
+        raise
+    (archive_root / f"{experiment_dir.name}{PARTIAL_SUFFIX}").unlink(missing_ok=True)
+    shutil.rmtree(experiment_dir)
+    return manifest
+
+
+def _archive_worker(args: tuple[Path, Path, str, str]) -> dict[str, Any]:
+    experiment_dir, archive_root, reason, fmt = args
+    try:
+        return archive_experiment(experiment_dir, archive_root, reason, fmt)
+    except Exception as e:
+        return {"experiment": experiment_dir.name, "error": f"{type(e).__name__}: {e}"}
+
+
+def main() -> int:
+    _configure_logging()
+    parser = argparse.ArgumentParser(
+        description="Archive old/failed experiments into experiments/_archive with compressed results + manifest."
+    )
+    parser.add_argument("experiments_root", type=Path, help="Path to a project's experiments/ folder")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--older-than-days", type=int, default=None, help="Archive experiments older than N days")
+    group.add_argument(
+        "--before", type=dt.date.fromisoformat, default=None, help="Archive experiments dated before YYYY-MM-DD"
+    )
+    parser.add_argument(
+        "--failed-preflight", action="store_true", help="Also archive experiments whose preflight failed"
+    )
+    parser.add_argument(
+        "--format",
+        choices=["auto", "parquet", "gzip"],
+        default="auto",
+        help="CSV compaction format (auto: parquet if pyarrow is installed, else gzip)",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel compression processes")
+    parser.add_argument("--dry-run", action="store_true", help="List candidates without moving anything")
+    args = parser.parse_args()
+
+    root = args.experiments_root.expanduser().resolve()
+    if not root.exists() or not root.is_dir():
+        LOGGER.error("Invalid experiments_root: %s", root)
+        return 1
+
+    cutoff = args.before
+    if args.older_than_days is not None:
+        cutoff = dt.date.today() - dt.timedelta(days=args.older_than_days)
+    if cutoff is None and not args.failed_preflight:
+        LOGGER.error("Nothing selected: pass --older-than-days/--before and/or --failed-preflight")
+        return 1
+
+    fmt = args.format
+    if fmt == "auto":
+        fmt = "parquet" if _have_pyarrow() else "gzip"
+    elif fmt == "parquet" and not _have_pyarrow():
+        LOGGER.error("--format parquet requires pyarrow (pip install pyarrow)")
+        return 1
+
+    candidates = select_candidates(root, cutoff, args.failed_preflight)
+    if not candidates:
+        LOGGER.info("No experiments to archive.")
+        return 0
+
+    if args.dry_run:
+        for exp_dir, reason in candidates:
+            LOGGER.info("Would archive: %s (%s)", exp_dir.name, reason)
+        return 0
+
+    # Imported here: preflight_backtest imports this module for open_result_csv, and the
+    # process-pool machinery is a large share of its startup time.
+    from concurrent.futures import ProcessPoolExecutor
+
+    archive_root = root / ARCHIVE_DIRNAME
+    t0 = time.perf_counter()
+    jobs = [(exp_dir, archive_root, reason, fmt) for exp_dir, reason in candidates]
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs)))) as pool:
+        manifests = list(pool.map(_archive_worker, jobs))
+
+    failed = 0
+    for m in manifests:
+        if "error" in m:
+            failed += 1
+            LOGGER.warning("FAIL | %s | %s", m["experiment"], m["error"])
+            continue
+        LOGGER.info(
+            "Archived: %s (%s) %.1f MB -> %.1f MB",
+            m["experiment"],
+            m["reason"],
+            m["original_bytes"] / 1e6,
+            m["stored_bytes"] / 1e6,
+        )
+    LOGGER.info(
+        "Done in %.2fs: archived=%d failed=%d format=%s",
+        time.perf_counter() - t0,
+        len(manifests) - failed,
+        failed,
+        fmt,
+    )
+    return 2 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
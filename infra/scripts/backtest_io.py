@@ -0,0 +1,73 @@
+"""
+Shared parsing helpers for backtest artifacts (results/*.csv).
+
+Column names vary between backtesters, so every reader resolves columns through
+the alias sets below (first match wins) and parses timestamps with parse_ts.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+
+
+TS_COLUMNS = {"timestamp", "ts", "time", "datetime", "fill_timestamp", "fill_time"}
+SIGNAL_TS_COLUMNS = {"signal_timestamp", "signal_ts", "signal_time"}
+SYMBOL_COLUMNS = {"symbol", "instrument", "instrument_id", "inst_id", "instrument_name"}
+PRICE_COLUMNS = {"price", "fill_price", "fill_px", "px"}
+BID_COLUMNS = {"bid", "best_bid", "bid_price"}
+ASK_COLUMNS = {"ask", "best_ask", "ask_price"}
+QUANTITY_COLUMNS = {"quantity", "qty", "position", "pos", "size", "contracts"}
+SIDE_COLUMNS = {"side", "direction"}
+MARK_COLUMNS = {"current_price", "mark_price", "mark", "mark_px"}
+VALUE_COLUMNS = {"market_value", "position_value", "value_coin", "mtm_value"}
+NAV_COLUMNS = {"nav", "equity", "portfolio_value", "value"}
+INDEX_COLUMNS = {"index_price", "index", "idx_px", "close", "price"}
+
+
+_EPOCH_NAIVE = dt.datetime(1970, 1, 1)
+
+
+def find_col(fieldnames: list[str], candidates: set[str]) -> int | None:
+    for i, c in enumerate(fieldnames):
+        if c and c.strip().lower() in candidates:
+            return i
+    return None
+
+
+def parse_ts(raw: str) -> float | None:
+    """
+    Parse a timestamp cell to epoch seconds (UTC).
+    Accepts ISO-8601 (naive = UTC) and epoch s/ms/us/ns.
+    """
+    raw = raw.strip()
+    if len(raw) >= 10 and raw[4] == "-":
+        try:
+            d = dt.datetime.fromisoformat(raw.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if d.tzinfo is None:
+            return (d - _EPOCH_NAIVE).total_seconds()
+        return d.timestamp()
+    try:
+        x = float(raw)
+    except ValueError:
+        return None
+    ax = abs(x)
+    if ax >= 1e17:
+        return x / 1e9  # ns
+    if ax >= 1e14:
+        return x / 1e6  # us
+    if ax >= 1e11:
+        return x / 1e3  # ms
+    return x
+
+
+def parse_float(raw: str) -> float | None:
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def fmt_ts(ts: float) -> str:
+    return dt.datetime.fromtimestamp(ts, dt.timezone.utc).isoformat(timespec="seconds")
@@ -42,7 +42,10 @@ def _create_if_missing(target_path: Path, content: str) -> bool:
     return True
 
 
-def bootstrap(project_root: Path, meta_root: Path) -> int:
+def plan_bootstrap(project_root: Path, meta_root: Path) -> dict[Path, str]:
+    """
+    Return {target_path: template_content} for the state files that are missing.
+    """
     if not project_root.exists() or not project_root.is_dir():
         raise NotADirectoryError(f"Invalid project root: {project_root}")
 
@@ -50,16 +53,28 @@ def bootstrap(project_root: Path, meta_root: Path) -> int:
     rules_template = _read_template(templates_dir / "PROJECT_RULES.md")
     state_template = _read_template(templates_dir / "STATE.md")
 
-    created_any = False
-    created_any |= _create_if_missing(project_root / "PROJECT_RULES.md", rules_template)
-    created_any |= _create_if_missing(project_root / "STATE.md", state_template)
+    targets = {
+        project_root / "PROJECT_RULES.md": rules_template,
+        project_root / "STATE.md": state_template,
+    }
+    return {path: content for path, content in targets.items() if not path.exists()}
 
-    if not created_any:
+
+def bootstrap(project_root: Path, meta_root: Path, dry_run: bool = False) -> int:
+    planned = plan_bootstrap(project_root, meta_root)
+
+    for target_path, content in planned.items():
+        if dry_run:
+            LOGGER.info("Would create: %s", target_path)
+            continue
+        _create_if_missing(target_path, content)
+
+    if not planned:
         LOGGER.info("No changes needed.")
     return 0
 
 
-def main() -> int:
+def main(argv: list[str] | None = None) -> int:
     _configure_logging()
     parser = argparse.ArgumentParser(
         description="Initialize per-project PROJECT_RULES.md and STATE.md (creates only if missing)."
@@ -75,10 +90,15 @@ def main() -> int:
         default=Path("/home/sqr/_meta"),
         help="Meta root containing templates/ (default: /home/sqr/_meta)",
     )
-    args = parser.parse_args()
+    parser.add_argument("--dry-run", action="store_true", help="Report missing files without writing")
+    args = parser.parse_args(argv)
 
     try:
-        return bootstrap(args.project_root.expanduser().resolve(), args.meta_root.expanduser().resolve())
+        return bootstrap(
+            args.project_root.expanduser().resolve(),
+            args.meta_root.expanduser().resolve(),
+            dry_run=args.dry_run,
+        )
     except Exception:
         LOGGER.exception("Bootstrap failed")
         return 1
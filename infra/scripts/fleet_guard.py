@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import argparse
+import difflib
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import bootstrap_project_state
+import project_guard
+
+
+LOGGER = logging.getLogger("fleet_guard")
+
+
+# A direct child of the fleet root counts as a project only if it already carries a file
+# this tooling owns. Generic markers (.git, README.md) would also match unrelated clones
+# such as ~/knowledge. New projects are brought in explicitly with --project.
+PROJECT_MARKERS = [
+    "PROJECT_RULES.md",
+    "STATE.md",
+    "experiments",
+]
+
+
+# Never guarded, even if a marker is present: the global knowledge base clone (see root README).
+DEFAULT_EXCLUDE = ["knowledge"]
+
+
+DEFAULT_WORKERS = 16
+
+
+@dataclass
+class ProjectReport:
+    name: str
+    path: str
+    created_dirs: list[str] = field(default_factory=list)
+    changed_files: list[str] = field(default_factory=list)
+    diff: str = ""
+    error: str | None = None
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.created_dirs or self.changed_files)
+
+
+def _configure_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+
+def discover_projects(
+    root: Path,
+    only: list[str] | None = None,
+    exclude: list[str] | None = None,
+) -> list[Path]:
+    """
+    Non-recursive: every visible child dir of root carrying a project marker.
+    Dirs starting with "." or "_" (e.g. _meta) are never projects; DEFAULT_EXCLUDE and `exclude` are skipped.
+    Names in `only` are an explicit allowlist: only they are guarded, even without a marker.
+    """
+    excluded = set(DEFAULT_EXCLUDE) | set(exclude or [])
+    projects: list[Path] = []
+    for child in sorted(root.iterdir()):
+        if not child.is_dir() or child.name.startswith((".", "_")):
+            continue
+        if only:
+            if child.name in only:
+                projects.append(child)
+            continue
+        if child.name in excluded:
+            continue
+        if any((child / marker).exists() for marker in PROJECT_MARKERS):
+            projects.append(child)
+    return projects
+
+
+def _file_diff(project_root: Path, target: Path, after: str) -> str:
+    rel = target.relative_to(project_root).as_posix()
+    before = target.read_text(encoding="utf-8") if target.exists() else ""
+    lines = difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        fromfile=f"a/{rel}" if target.exists() else "/dev/null",
+        tofile=f"b/{rel}",
+    )
+    return "".join(lines)
+
+
+def guard_project(project_root: Path, meta_root: Path, dry_run: bool, with_bootstrap: bool = True) -> ProjectReport:
+    """
+    Run project_guard + bootstrap_project_state on one project.
+    In dry-run mode nothing is written; the report carries a unified diff instead.
+    """
+    report = ProjectReport(name=project_root.name, path=str(project_root))
+    try:
+        planned_files: dict[Path, str] = {}
+
+        gi = project_root / ".gitignore"
+        gi_after = project_guard.render_gitignore(gi.read_text(encoding="utf-8") if gi.exists() else None)
+        if gi_after is not None:
+            planned_files[gi] = gi_after
+
+        exp_readme = project_root / "experiments" / "README.md"
+        if not exp_readme.exists():
+            planned_files[exp_readme] = project_guard.EXPERIMENT_README_STUB
+
+        if with_bootstrap:
+            planned_files.update(bootstrap_project_state.plan_bootstrap(project_root, meta_root))
+
+        if dry_run:
+            diffs = [_file_diff(project_root, p, content) for p, content in planned_files.items()]
+            dirs = project_guard.ensure_dirs(project_root, dry_run=True)
+            dir_lines = [f"+ mkdir {p.relative_to(project_root).as_posix()}/\n" for p in dirs]
+            report.diff = "".join(dir_lines + diffs)
+        else:
+            dirs = project_guard.ensure_dirs(project_root)
+            project_guard.ensure_gitignore(project_root)
+            project_guard.ensure_experiment_readme_stub(project_root)
+            if with_bootstrap:
+                bootstrap_project_state.bootstrap(project_root, meta_root)
+
+        report.created_dirs = [p.relative_to(project_root).as_posix() for p in dirs]
+        report.changed_files = sorted(p.relative_to(project_root).as_posix() for p in planned_files)
+    except Exception as e:
+        LOGGER.exception("Guard failed: %s", project_root)
+        report.error = f"{type(e).__name__}: {e}"
+    return report
+
+
+def run_fleet(
+    projects: list[Path],
+    meta_root: Path,
+    dry_run: bool,
+    with_bootstrap: bool = True,
+    workers: int = DEFAULT_WORKERS,
+) -> list[ProjectReport]:
+    # Work is filesystem-bound (stat/read/write of a handful of small files), so threads are enough.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(lambda p: guard_project(p, meta_root, dry_run, with_bootstrap), projects))
+
+
+def build_summary(root: Path, reports: list[ProjectReport], dry_run: bool, elapsed_sec: float) -> dict:
+    return {
+        "root": str(root),
+        "dry_run": dry_run,
+        "elapsed_sec": round(elapsed_sec, 3),
+        "projects_total": len(reports),
+        "projects_changed": sum(1 for r in reports if r.changed),
+        "projects_failed": sum(1 for r in reports if r.error),
+        "projects": [{**asdict(r), "changed": r.changed} for r in reports],
+    }
+
+
+def main() -> int:
+    _configure_logging()
+    parser = argparse.ArgumentParser(
+        description="Fleet mode: run project_guard + bootstrap_project_state over every project under a root."
+    )
+    parser.add_argument(
+        "root",
+        type=Path,
+        nargs="?",
+        default=Path("/home/sqr"),
+        help="Directory whose children are projects (default: /home/sqr)",
+    )
+    parser.add_argument(
+        "--meta-root",
+        type=Path,
+        default=Path("/home/sqr/_meta"),
+        help="Meta root containing templates/ (default: /home/sqr/_meta)",
+    )
+    parser.add_argument(
+        "--project",
+        action="append",
+        default=None,
+        help="Guard only this project, even without a marker (repeatable; use to adopt a new project)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        help=f"Also skip this child dir (repeatable; always skipped: {', '.join(DEFAULT_EXCLUDE)})",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Print a unified diff of planned changes; write nothing")
+    parser.add_argument("--no-bootstrap", action="store_true", help="Skip PROJECT_RULES.md/STATE.md bootstrap")
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help=f"Thread pool size (default: {DEFAULT_WORKERS})"
+    )
+    parser.add_argument("--json", type=Path, default=None, help="Write JSON summary to this path ('-' for stdout)")
+    args = parser.parse_args()
+
+    root = args.root.expanduser().resolve()
+    if not root.exists() or not root.is_dir():
+        LOGGER.error("Invalid fleet root: %s", root)
+        return 1
+
+    projects = discover_projects(root, only=args.project, exclude=args.exclude)
+    LOGGER.info("Discovered %d project(s) under %s", len(projects), root)
+
+    t0 = time.perf_counter()
+    reports = run_fleet(
+        projects,
+        args.meta_root.expanduser().resolve(),
+        dry_run=args.dry_run,
+        with_bootstrap=not args.no_bootstrap,
+        workers=args.workers,
+    )
+    elapsed = time.perf_counter() - t0
+
+    # With --json -, stdout carries only the JSON document; diffs go to stderr (they are also in each "diff").
+    json_to_stdout = args.json is not None and str(args.json) == "-"
+    diff_stream = sys.stderr if json_to_stdout else sys.stdout
+    for r in reports:
+        if r.error:
+            LOGGER.warning("FAIL | %s | %s", r.name, r.error)
+        elif r.changed:
+            LOGGER.info(
+                "%s | %s | dirs=%d files=%s",
+                "PLAN" if args.dry_run else "FIXED",
+                r.name,
+                len(r.created_dirs),
+                r.changed_files,
+            )
+        else:
+            LOGGER.info("OK | %s | no changes needed", r.name)
+        if args.dry_run and r.diff:
+            diff_stream.write(r.diff)
+
+    summary = build_summary(root, reports, args.dry_run, elapsed)
+    LOGGER.info(
+        "Fleet done in %.2fs: total=%d changed=%d failed=%d",
+        elapsed,
+        summary["projects_total"],
+        summary["projects_changed"],
+        summary["projects_failed"],
+    )
+    if args.json is not None:
+        payload = json.dumps(summary, indent=2)
+        if json_to_stdout:
+            sys.stdout.write(payload + "\n")
+        else:
+            args.json.parent.mkdir(parents=True, exist_ok=True)
+            args.json.write_text(payload, encoding="utf-8")
+            LOGGER.info("Wrote summary: %s", args.json)
+
+    return 2 if summary["projects_failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
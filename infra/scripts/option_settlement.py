@@ -0,0 +1,567 @@
+"""
+Option expiry settlement for backtest NAV validation.
+
+Finds option positions still held after their 08:00 UTC expiry
+(research/standards/backtesting_nav_policy.md, Mistake 5), settles them at the
+index price @ 08:00 UTC with the inverse (coin) payoff
+(exchanges/okx/settlement_details.md, trading/fundamentals/inverse_options.md),
+and writes a corrected NAV track. Trades on an option at/after its expiry could not have
+happened, so the cash the backtest booked for them (e.g. selling the expired leg at its
+stale mark) is reversed; otherwise NAV would count both those proceeds and the payoff.
+Fees of such trades are not reversed.
+
+Units:
+- quantity: signed contracts
+- contract_size: coin per contract (OKX ctVal: BTC 0.01, ETH 0.1; Deribit amounts are in coin -> 1.0)
+- mark price: coin per 1 coin of underlying (exchange quote convention)
+- payoff per contract (coin): contract_size * max(S - K, 0) / S for calls, max(K - S, 0) / S for puts
+
+Usage:
+    python3 option_settlement.py <experiment_dir> --index index.csv [--nav-currency usd]
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import csv
+import datetime as dt
+import logging
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+from archive_experiments import open_result_csv, resolve_result_path
+from backtest_io import (
+    INDEX_COLUMNS,
+    MARK_COLUMNS,
+    NAV_COLUMNS,
+    PRICE_COLUMNS,
+    QUANTITY_COLUMNS,
+    SIDE_COLUMNS,
+    SYMBOL_COLUMNS,
+    TS_COLUMNS,
+    VALUE_COLUMNS,
+    find_col,
+    fmt_ts,
+    parse_float,
+    parse_ts,
+)
+
+
+LOGGER = logging.getLogger("option_settlement")
+
+
+SETTLEMENT_HOUR_UTC = 8
+OKX_OPTION_RE = re.compile(r"^(?P<underlying>[A-Z]+)-[A-Z]+-(?P<expiry>\d{6})-(?P<strike>[\d.]+)-(?P<cp>[CP])$")
+DERIBIT_OPTION_RE = re.compile(
+    r"^(?P<underlying>[A-Z]+)-(?P<expiry>\d{1,2}[A-Z]{3}\d{2})-(?P<strike>[\d.]+)-(?P<cp>[CP])$",
+    re.IGNORECASE,
+)
+
+
+# OKX ctVal (exchanges/okx/options_specifications.md).
+OKX_CONTRACT_SIZES = {"BTC": 0.01, "ETH": 0.1}
+
+
+# Max gap between settlement time and the last index print before it.
+MAX_INDEX_STALENESS_SEC = 3600.0
+
+
+@dataclass(frozen=True)
+class OptionSpec:
+    symbol: str
+    underlying: str
+    expiry_ts: float
+    strike: float
+    is_call: bool
+    contract_size: float
+
+
+@dataclass(frozen=True)
+class Settlement:
+    symbol: str
+    underlying: str
+    expiry_ts: float
+    settlement_price: float
+    quantity: float
+    payoff_coin: float
+    stale_rows: int
+    post_expiry_trades: int = 0
+    trade_cash_coin: float = 0.0  # cash the backtest booked for those trades (reversed in the correction)
+
+
+def _configure_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+
+@lru_cache(maxsize=None)
+def parse_option_symbol(symbol: str) -> OptionSpec | None:
+    """
+    OKX: BTC-USD-250131-50000-C, Deribit: BTC-31JAN25-50000-C. Returns None for non-options.
+    """
+    symbol = symbol.strip()
+    m = OKX_OPTION_RE.match(symbol)
+    deribit = False
+    if m is None:
+        m = DERIBIT_OPTION_RE.match(symbol)
+        deribit = m is not None
+    if m is None:
+        return None
+    raw = m.group("expiry")
+    try:
+        if deribit:
+            day = dt.datetime.strptime(raw.upper().rjust(7, "0"), "%d%b%y")
+        else:
+            day = dt.datetime.strptime(raw, "%y%m%d")
+    except ValueError:
+        return None
+    underlying = m.group("underlying").upper()
+    return OptionSpec(
+        symbol=symbol,
+        underlying=underlying,
+        expiry_ts=day.replace(hour=SETTLEMENT_HOUR_UTC, tzinfo=dt.timezone.utc).timestamp(),
+        strike=float(m.group("strike")),
+        is_call=m.group("cp").upper() == "C",
+        contract_size=1.0 if deribit else OKX_CONTRACT_SIZES.get(underlying, 1.0),
+    )
+
+
+def inverse_payoff_coin(spec: OptionSpec, settlement_price: float, contract_size: float | None = None) -> float:
+    """Coin paid to a long holder per contract at settlement."""
+    if settlement_price <= 0:
+        raise ValueError(f"Settlement price must be positive, got {settlement_price}")
+    intrinsic = settlement_price - spec.strike if spec.is_call else spec.strike - settlement_price
+    size = spec.contract_size if contract_size is None else contract_size
+    return size * max(intrinsic, 0.0) / settlement_price
+
+
+class IndexSeries:
+    """Sorted index price series with as-of lookup."""
+
+    def __init__(self, ts: list[float], px: list[float]) -> None:
+        if any(b < a for a, b in zip(ts, ts[1:])):
+            order = sorted(range(len(ts)), key=ts.__getitem__)
+            ts = [ts[i] for i in order]
+            px = [px[i] for i in order]
+        self.ts = ts
+        self.px = px
+
+    def asof(self, t: float) -> tuple[float, float] | None:
+        """(timestamp, price) of the last print <= t."""
+        i = bisect.bisect_right(self.ts, t) - 1
+        if i < 0:
+            return None
+        return self.ts[i], self.px[i]
+
+
+def underlying_of(symbol: str) -> str:
+    """Underlying code from an instrument or index id (BTC-USD-250131-50000-C, BTC-USD -> BTC)."""
+    return symbol.strip().split("-")[0].upper()
+
+
+def load_index_by_underlying(path: Path) -> dict[str | None, IndexSeries]:
+    """
+    {underlying: IndexSeries}, keyed by the symbol column's prefix (BTC-USD -> BTC).
+    Without a symbol column the single series is keyed None (see series_for).
+    """
+    rows: dict[str | None, tuple[list[float], list[float]]] = {}
+    with open_result_csv(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        ts_i = find_col(header, TS_COLUMNS)
+        px_i = find_col(header, INDEX_COLUMNS)
+        sym_i = find_col(header, SYMBOL_COLUMNS)
+        if ts_i is None or px_i is None:
+            raise ValueError(f"{path}: need timestamp + index_price columns, got {header}")
+        for row in reader:
+            if len(row) <= max(ts_i, px_i):
+                continue
+            t = parse_ts(row[ts_i])
+            p = parse_float(row[px_i])
+            if t is None or p is None:
+                continue
+            key = underlying_of(row[sym_i]) if sym_i is not None and len(row) > sym_i else None
+            ts, px = rows.setdefault(key, ([], []))
+            ts.append(t)
+            px.append(p)
+    if not rows:
+        raise ValueError(f"{path}: no index rows")
+    return {k: IndexSeries(ts, px) for k, (ts, px) in rows.items()}
+
+
+def series_for(index: dict[str | None, IndexSeries], underlying: str) -> IndexSeries | None:
+    """The underlying's own series; an unkeyed index (no symbol column) serves every underlying."""
+    return index.get(underlying) or index.get(None)
+
+
+def require_index_coverage(index: dict[str | None, IndexSeries], underlyings: set[str]) -> None:
+    """
+    Raise ValueError unless every underlying has its own series. A single unkeyed series is
+    accepted only when there is exactly one underlying; otherwise it would price ETH at BTC's index.
+    """
+    keyed = {k for k in index if k is not None}
+    if not keyed and len(underlyings) <= 1:
+        return
+    missing = sorted(underlyings - keyed)
+    if missing:
+        raise ValueError(
+            f"Index has no series for {', '.join(missing)} (have: {', '.join(sorted(keyed)) or 'one unkeyed series'}); "
+            "add a symbol column with one series per underlying"
+        )
+
+
+def find_positions_past_expiry(positions_path: Path) -> dict[str, tuple[int, float]]:
+    """
+    Stream positions.csv and return {symbol: (rows, first_ts)} for option rows with
+    non-zero quantity at or after expiry (settlement happens at the 08:00 UTC snapshot).
+    """
+    stale: dict[str, tuple[int, float]] = {}
+    with open_result_csv(positions_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        ts_i = find_col(header, TS_COLUMNS)
+        sym_i = find_col(header, SYMBOL_COLUMNS)
+        qty_i = find_col(header, QUANTITY_COLUMNS)
+        if ts_i is None or sym_i is None or qty_i is None:
+            raise ValueError(f"{positions_path}: need timestamp, symbol, quantity columns, got {header}")
+        width = max(ts_i, sym_i, qty_i) + 1
+        for row in reader:
+            if len(row) < width:
+                continue
+            spec = parse_option_symbol(row[sym_i])
+            if spec is None:
+                continue
+            t = parse_ts(row[ts_i])
+            q = parse_float(row[qty_i])
+            if t is None or not q or t < spec.expiry_ts:
+                continue
+            n, first = stale.get(spec.symbol, (0, t))
+            stale[spec.symbol] = (n + 1, min(first, t))
+    return stale
+
+
+def load_post_expiry_trades(trades_path: Path, contract_size: float | None) -> dict[str, list[tuple[float, float]]]:
+    """
+    Stream trades.csv and return {symbol: [(ts, cash_coin)]} for option trades at/after
+    expiry. cash_coin is what the backtest booked: -signed_qty * contract_size * price
+    (a sale is positive). Quantity is signed unless a side column (buy/sell) is present.
+    Raises ValueError if such trades exist but their cash can't be computed.
+    """
+    out: dict[str, list[tuple[float, float]]] = {}
+    with open_result_csv(trades_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        ts_i = find_col(header, TS_COLUMNS)
+        sym_i = find_col(header, SYMBOL_COLUMNS)
+        qty_i = find_col(header, QUANTITY_COLUMNS)
+        px_i = find_col(header, PRICE_COLUMNS)
+        side_i = find_col(header, SIDE_COLUMNS)
+        if ts_i is None or sym_i is None:
+            raise ValueError(f"{trades_path}: need timestamp, symbol columns, got {header}")
+        width = max(ts_i, sym_i) + 1
+        for row in reader:
+            if len(row) < width:
+                continue
+            spec = parse_option_symbol(row[sym_i])
+            t = parse_ts(row[ts_i]) if spec is not None else None
+            if t is None or t < spec.expiry_ts:
+                continue
+            q = parse_float(row[qty_i]) if qty_i is not None and len(row) > qty_i else None
+            px = parse_float(row[px_i]) if px_i is not None and len(row) > px_i else None
+            if q is None or px is None:
+                raise ValueError(
+                    f"{trades_path}: {spec.symbol} traded at {fmt_ts(t)}, after its expiry, but the trade has no "
+                    "quantity/price; can't net its cash out of the settlement, refusing the correction"
+                )
+            side = row[side_i].strip().lower() if side_i is not None and len(row) > side_i else ""
+            if side.startswith("s"):
+                q = -abs(q)
+            elif side.startswith("b"):
+                q = abs(q)
+            size = spec.contract_size if contract_size is None else contract_size
+            out.setdefault(spec.symbol, []).append((t, -q * size * px))
+    return out
+
+
+def _load_option_positions(
+    positions_path: Path, contract_size: float | None
+) -> tuple[list[float], dict[str, float], dict[str, list[tuple[float, float, float]]]]:
+    """
+    One pass over positions.csv.
+
+    Returns:
+        snapshots: sorted distinct snapshot timestamps (all symbols)
+        qty_at_expiry: {symbol: quantity of the last row before expiry}
+        stale_rows: {symbol: [(ts, quantity, value_coin)]} for rows at/after expiry, sorted by ts
+    """
+    snapshots: set[float] = set()
+    last_before: dict[str, tuple[float, float]] = {}
+    stale_rows: dict[str, list[tuple[float, float, float]]] = {}
+    with open_result_csv(positions_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        ts_i = find_col(header, TS_COLUMNS)
+        sym_i = find_col(header, SYMBOL_COLUMNS)
+        qty_i = find_col(header, QUANTITY_COLUMNS)
+        val_i = find_col(header, VALUE_COLUMNS)
+        mark_i = find_col(header, MARK_COLUMNS)
+        if ts_i is None or sym_i is None or qty_i is None:
+            raise ValueError(f"{positions_path}: need timestamp, symbol, quantity columns, got {header}")
+        width = max(ts_i, sym_i, qty_i) + 1
+        for row in reader:
+            if len(row) < width:
+                continue
+            t = parse_ts(row[ts_i])
+            if t is None:
+                continue
+            snapshots.add(t)
+            spec = parse_option_symbol(row[sym_i])
+            if spec is None:
+                continue
+            q = parse_float(row[qty_i]) or 0.0
+            if t < spec.expiry_ts:
+                prev = last_before.get(spec.symbol)
+                if prev is None or t >= prev[0]:
+                    last_before[spec.symbol] = (t, q)
+                continue
+            if q == 0.0:
+                continue
+            # Value the backtest still carries for the expired position.
+            value = parse_float(row[val_i]) if val_i is not None and len(row) > val_i else None
+            if value is None:
+                mark = parse_float(row[mark_i]) if mark_i is not None and len(row) > mark_i else None
+                size = spec.contract_size if contract_size is None else contract_size
+                value = q * size * mark if mark is not None else 0.0
+            stale_rows.setdefault(spec.symbol, []).append((t, q, value))
+
+    for rows in stale_rows.values():
+        rows.sort()
+    qty_at_expiry = {sym: q for sym, (_, q) in last_before.items()}
+    return sorted(snapshots), qty_at_expiry, stale_rows
+
+
+def settle_positions(
+    positions_path: Path,
+    index: dict[str | None, IndexSeries],
+    contract_size: float | None = None,
+    trades_path: Path | None = None,
+) -> tuple[list[Settlement], list[tuple[float, str, float]]]:
+    """
+    Settle every option held past expiry (or traded after it) against its own underlying's index.
+
+    Returns (settlements, events) where events are (ts, underlying, delta_coin) steps of the
+    NAV correction: +payoff at expiry, -(change in stale carried value) at every positions
+    snapshot from expiry on, and -cash of every post-expiry trade (trades_path) at its time.
+    The correction at time t is the sum of deltas <= t, so all expiries are applied in one
+    sorted pass regardless of how many there are.
+    Raises ValueError if an underlying has no index series.
+    """
+    snapshots, qty_at_expiry, stale_rows = _load_option_positions(positions_path, contract_size)
+    trades = load_post_expiry_trades(trades_path, contract_size) if trades_path is not None else {}
+    # A leg closed by a post-expiry trade before the next snapshot has no stale rows but still settles.
+    specs = {symbol: parse_option_symbol(symbol) for symbol in stale_rows.keys() | trades.keys()}
+    require_index_coverage(index, {spec.underlying for spec in specs.values() if spec is not None})
+
+    settlements: list[Settlement] = []
+    events: list[tuple[float, str, float]] = []
+    for symbol in sorted(specs):
+        rows = stale_rows.get(symbol, [])
+        spec = specs[symbol]
+        assert spec is not None
+        series = series_for(index, spec.underlying)
+        assert series is not None
+        u = spec.underlying
+        hit = series.asof(spec.expiry_ts)
+        if hit is None:
+            LOGGER.warning("No index price at/before expiry %s for %s; skipped", fmt_ts(spec.expiry_ts), symbol)
+            continue
+        idx_ts, settle_px = hit
+        if spec.expiry_ts - idx_ts > MAX_INDEX_STALENESS_SEC:
+            LOGGER.warning("Stale index for %s: last print %s before expiry", symbol, fmt_ts(idx_ts))
+
+        qty = qty_at_expiry.get(symbol, rows[0][1] if rows else 0.0)
+        payoff = qty * inverse_payoff_coin(spec, settle_px, contract_size)
+        symbol_trades = trades.get(symbol, [])
+        trade_cash = sum(cash for _, cash in symbol_trades)
+        settlements.append(
+            Settlement(symbol, u, spec.expiry_ts, settle_px, qty, payoff, len(rows), len(symbol_trades), trade_cash)
+        )
+        events.append((spec.expiry_ts, u, payoff))
+        events.extend((t, u, -cash) for t, cash in symbol_trades)
+
+        # Carried value follows the symbol's own rows and drops to 0 on any snapshot it is absent from.
+        carried = 0.0
+        for k, (t, _, value) in enumerate(rows):
+            events.append((t, u, -(value - carried)))
+            carried = value
+            next_row_ts = rows[k + 1][0] if k + 1 < len(rows) else float("inf")
+            j = bisect.bisect_right(snapshots, t)
+            if j < len(snapshots) and snapshots[j] < next_row_ts:
+                events.append((snapshots[j], u, carried))
+                carried = 0.0
+
+    events.sort()
+    settlements.sort(key=lambda s: (s.expiry_ts, s.symbol))
+    return settlements, events
+
+
+def corrected_nav(
+    nav_path: Path,
+    events: list[tuple[float, str, float]],
+    index: dict[str | None, IndexSeries] | None = None,
+) -> list[tuple[str, float, float, float]]:
+    """
+    Merge NAV rows with the sorted correction events.
+    Returns [(timestamp_raw, nav, correction, nav_settled)]. Without an index nav.csv is in
+    coin, so all events must share one underlying. With an index, each underlying's coin
+    correction is converted at its own as-of index price (USD NAV).
+    """
+    underlyings = {u for _, u, _ in events}
+    if index is None and len(underlyings) > 1:
+        raise ValueError(
+            f"Settlements span {', '.join(sorted(underlyings))} but nav.csv is in one coin; use --nav-currency usd"
+        )
+    out: list[tuple[str, float, float, float]] = []
+    with open_result_csv(nav_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        ts_i = find_col(header, TS_COLUMNS)
+        nav_i = find_col(header, NAV_COLUMNS)
+        ts_i = 0 if ts_i is None else ts_i
+        nav_i = (1 if len(header) > 1 else 0) if nav_i is None else nav_i
+        width = max(ts_i, nav_i) + 1
+
+        k = 0
+        cum: dict[str, float] = {}
+        for row in reader:
+            if len(row) < width:
+                continue
+            t = parse_ts(row[ts_i])
+            nav = parse_float(row[nav_i])
+            if t is None or nav is None:
+                continue
+            while k < len(events) and events[k][0] <= t:
+                _, u, delta = events[k]
+                cum[u] = cum.get(u, 0.0) + delta
+                k += 1
+            if index is None:
+                correction = sum(cum.values())
+            else:
+                correction = 0.0
+                for u, coin in cum.items():
+                    series = series_for(index, u)
+                    hit = series.asof(t) if series is not None and coin != 0.0 else None
+                    if hit is not None:
+                        correction += coin * hit[1]
+            out.append((row[ts_i], nav, correction, nav + correction))
+    return out
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Settle options held past expiry (08:00 UTC, inverse payoff) and write a corrected NAV."
+    )
+    parser.add_argument("experiment_dir", type=Path, help="Experiment folder containing results/")
+    parser.add_argument(
+        "--index", type=Path, required=True, help="CSV with timestamp,[symbol],index_price (one series per underlying)"
+    )
+    parser.add_argument(
+        "--nav-currency",
+        choices=["coin", "usd"],
+        default="coin",
+        help="Unit of nav.csv (usd: convert the coin correction at the as-of index price)",
+    )
+    parser.add_argument("--contract-size", type=float, default=None, help="Override coin per contract")
+    args = parser.parse_args()
+
+    exp_dir = args.experiment_dir.expanduser().resolve()
+    positions_path = exp_dir / "results/positions.csv"
+    nav_path = exp_dir / "results/nav.csv"
+    for p in (positions_path, nav_path):
+        if resolve_result_path(p) is None:
+            LOGGER.error("Missing: %s", p)
+            return 1
+
+    trades_path: Path | None = exp_dir / "results/trades.csv"
+    if resolve_result_path(trades_path) is None:
+        LOGGER.warning("No %s: cash from trades on expired options can't be netted out", trades_path)
+        trades_path = None
+
+    index = load_index_by_underlying(args.index.expanduser().resolve())
+    settlements, events = settle_positions(positions_path, index, args.contract_size, trades_path)
+    if not settlements:
+        LOGGER.info("No positions held past expiry; NAV needs no settlement correction.")
+        return 0
+
+    rows = corrected_nav(nav_path, events, index if args.nav_currency == "usd" else None)
+
+    settlements_path = exp_dir / "results/settlements.csv"
+    with settlements_path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(
+            [
+                "symbol",
+                "underlying",
+                "expiry",
+                "settlement_price",
+                "quantity",
+                "payoff_coin",
+                "stale_rows",
+                "post_expiry_trades",
+                "trade_cash_coin",
+            ]
+        )
+        for s in settlements:
+            w.writerow(
+                [
+                    s.symbol,
+                    s.underlying,
+                    fmt_ts(s.expiry_ts),
+                    s.settlement_price,
+                    s.quantity,
+                    s.payoff_coin,
+                    s.stale_rows,
+                    s.post_expiry_trades,
+                    s.trade_cash_coin,
+                ]
+            )
+
+    nav_out = exp_dir / "results/nav_settled.csv"
+    with nav_out.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["timestamp", "nav", "settlement_correction", "nav_settled"])
+        w.writerows(rows)
+
+    LOGGER.warning("%d option(s) held past expiry were settled", len(settlements))
+    traded = [s for s in settlements if s.post_expiry_trades]
+    if traded:
+        LOGGER.warning(
+            "%d option(s) traded after expiry; their booked cash (%s) was reversed",
+            len(traded),
+            ", ".join(f"{s.symbol} {s.trade_cash_coin:+.6f}" for s in traded[:5]),
+        )
+    payoff_by_underlying: dict[str, float] = {}
+    for s in settlements:
+        payoff_by_underlying[s.underlying] = payoff_by_underlying.get(s.underlying, 0.0) + s.payoff_coin
+    for u, payoff in sorted(payoff_by_underlying.items()):
+        LOGGER.info("Total payoff: %.6f %s", payoff, u)
+    if rows:
+        LOGGER.info("Final NAV: %.6f -> %.6f (%s)", rows[-1][1], rows[-1][3], args.nav_currency)
+    LOGGER.info("Wrote: %s", settlements_path)
+    LOGGER.info("Wrote: %s", nav_out)
+    return 0
+
+
+def main() -> int:
+    _configure_logging()
+    try:
+        return _main()
+    except ValueError as e:
+        LOGGER.error("%s", e)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,489 @@
+"""
+Portfolio-margin stress engine (OKX PM approximation) over an hourly position history.
+
+Maintenance margin per snapshot follows exchanges/okx/margin_and_leverage.md:
+
+    MM = sum over underlyings of max(scenario loss on spot-shock x vol-shock grid) * 1.2
+
+Scenario P&L is delta-gamma-vega: dS * Delta + 0.5 * dS^2 * Gamma + dVol * Vega.
+The grid basis (s, s^2/2, dvol) is precomputed once; per snapshot only the aggregate
+Greeks per underlying change, so each snapshot costs O(grid) no matter how many legs it has.
+
+Greek conventions (see exchanges/_common/greeks_converter.py):
+- usd (OKX BS / Deribit): delta per 1 coin, gamma per $1, vega USD per 1 IV point
+- okx_pa: delta/vega in coin units; vega is converted PA x spot = USD. PA gamma has no
+  reliable unit, so gamma must come from the BS column (gamma_bs / gammaBS).
+Position exposure = quantity * contract_size * greek. Options take contract_size (ctVal) from
+the symbol. Non-option (linear) legs are taken as quantity in coin (contract_size 1.0) unless
+a ctVal is given per symbol with --linear-contract-size, e.g. BTC-USDT-SWAP=0.01 for OKX
+swaps quoted in contracts.
+
+Margin ratio is reported as equity / MM (liquidation when <= 1.0); the doc's
+MM / equity > 100% trigger is the same condition.
+
+Usage:
+    python3 portfolio_margin.py <experiment_dir> --index index.csv [--nav-currency coin]
+    python3 portfolio_margin.py <experiment_dir> --index index.csv --at 2025-03-01T00:00:00
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import logging
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from archive_experiments import open_result_csv, resolve_result_path
+from backtest_io import (
+    NAV_COLUMNS,
+    QUANTITY_COLUMNS,
+    SYMBOL_COLUMNS,
+    TS_COLUMNS,
+    find_col,
+    fmt_ts,
+    parse_float,
+    parse_ts,
+)
+from option_settlement import IndexSeries, load_index_by_underlying, parse_option_symbol, series_for, underlying_of
+
+
+LOGGER = logging.getLogger("portfolio_margin")
+
+
+DEFAULT_SPOT_SHOCKS = (-0.15, -0.10, -0.07, -0.05, -0.03, 0.0, 0.03, 0.05, 0.07, 0.10, 0.15)
+DEFAULT_VOL_SHOCKS = (-20.0, -10.0, 0.0, 10.0, 20.0)  # IV points
+MM_BUFFER = 1.2
+LIQUIDATION_RATIO = 1.0
+
+
+# Column priority per Greek convention (first present column wins).
+USD_GREEK_COLUMNS = {
+    "delta": ("delta_bs", "deltabs", "delta"),
+    "gamma": ("gamma_bs", "gammabs", "gamma"),
+    "vega": ("vega_bs", "vegabs", "vega"),
+}
+OKX_PA_GREEK_COLUMNS = {
+    "delta": ("delta_pa", "delta"),
+    "gamma": ("gamma_bs", "gammabs"),
+    "vega": ("vega_pa", "vega"),
+}
+
+
+@dataclass(frozen=True)
+class ScenarioGrid:
+    spot_shocks: tuple[float, ...]
+    vol_shocks: tuple[float, ...]
+    s: tuple[float, ...]
+    half_s2: tuple[float, ...]
+    dvol: tuple[float, ...]
+
+    @classmethod
+    def build(cls, spot_shocks: tuple[float, ...], vol_shocks: tuple[float, ...]) -> ScenarioGrid:
+        pairs = [(s, v) for s in spot_shocks for v in vol_shocks]
+        return cls(
+            spot_shocks=spot_shocks,
+            vol_shocks=vol_shocks,
+            s=tuple(s for s, _ in pairs),
+            half_s2=tuple(0.5 * s * s for s, _ in pairs),
+            dvol=tuple(v for _, v in pairs),
+        )
+
+    def label(self, k: int) -> str:
+        return f"spot{self.s[k]:+.0%}/vol{self.dvol[k]:+g}"
+
+    def pnl(self, spot: float, delta: float, gamma: float, vega: float) -> list[float]:
+        """Scenario P&L (USD) for aggregate coin delta, gamma per $1 and USD vega."""
+        a = delta * spot
+        b = gamma * spot * spot
+        return [a * s + b * h + vega * v for s, h, v in zip(self.s, self.half_s2, self.dvol)]
+
+    def worst_loss(self, spot: float, delta: float, gamma: float, vega: float) -> tuple[float, int]:
+        pnl = self.pnl(spot, delta, gamma, vega)
+        k = min(range(len(pnl)), key=pnl.__getitem__)
+        return max(-pnl[k], 0.0), k
+
+
+@dataclass(frozen=True)
+class MarginSnapshot:
+    ts: float
+    equity_usd: float | None
+    maintenance_margin_usd: float
+    margin_ratio: float | None
+    worst_underlying: str | None
+    worst_scenario: str | None
+
+
+def _configure_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+
+def _first_col(header: list[str], names: tuple[str, ...]) -> int | None:
+    lowered = [c.strip().lower() for c in header]
+    for name in names:
+        if name in lowered:
+            return lowered.index(name)
+    return None
+
+
+def load_equity(nav_path: Path) -> IndexSeries | None:
+    ts: list[float] = []
+    px: list[float] = []
+    with open_result_csv(nav_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        ts_i = find_col(header, TS_COLUMNS)
+        nav_i = find_col(header, NAV_COLUMNS)
+        ts_i = 0 if ts_i is None else ts_i
+        nav_i = (1 if len(header) > 1 else 0) if nav_i is None else nav_i
+        for row in reader:
+            if len(row) <= max(ts_i, nav_i):
+                continue
+            t = parse_ts(row[ts_i])
+            v = parse_float(row[nav_i])
+            if t is not None and v is not None:
+                ts.append(t)
+                px.append(v)
+    return IndexSeries(ts, px) if ts else None
+
+
+Greeks = dict[str, tuple[float, float, float]]
+
+
+def iter_snapshots(
+    positions_path: Path, greeks_unit: str, linear_sizes: dict[str, float] | None = None
+) -> Iterator[tuple[float, Greeks]]:
+    """
+    Stream a time-sorted positions history and yield
+    (ts, {underlying: (coin_delta, gamma, vega)}) per snapshot.
+
+    Greeks are cached per instrument: a row with blank Greek cells reuses the last
+    Greeks seen for that symbol, so sparse logs (Greeks only on change) work too.
+    Vega is aggregated in the input unit; okx_pa vega is converted to USD by the caller.
+    Option legs need delta and vega columns (and gamma); non-option legs without Greeks
+    count quantity * linear_sizes.get(symbol, 1.0) as coin delta.
+    """
+    columns = OKX_PA_GREEK_COLUMNS if greeks_unit == "okx_pa" else USD_GREEK_COLUMNS
+    greek_cache: dict[str, tuple[float, float, float]] = {}
+    size_cache: dict[str, float] = {}
+    linear_sizes = linear_sizes or {}
+
+    with open_result_csv(positions_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        ts_i = find_col(header, TS_COLUMNS)
+        sym_i = find_col(header, SYMBOL_COLUMNS)
+        qty_i = find_col(header, QUANTITY_COLUMNS)
+        d_i = _first_col(header, columns["delta"])
+        g_i = _first_col(header, columns["gamma"])
+        v_i = _first_col(header, columns["vega"])
+        if ts_i is None or sym_i is None or qty_i is None:
+            raise ValueError(f"{positions_path}: need timestamp, symbol, quantity columns, got {header}")
+        if greeks_unit == "okx_pa" and g_i is None:
+            raise ValueError(
+                "OKX PA Gamma unit is unclear; provide a gamma_bs/gammaBS column. "
+                "See exchanges/_common/greeks_converter.py"
+            )
+        missing_greeks = [name for name, i in (("delta", d_i), ("gamma", g_i), ("vega", v_i)) if i is None]
+
+        def _cell(row: list[str], i: int | None) -> float | None:
+            return parse_float(row[i]) if i is not None and i < len(row) and row[i].strip() else None
+
+        current_ts: float | None = None
+        agg: dict[str, list[float]] = {}
+        for row in reader:
+            if len(row) <= max(ts_i, sym_i, qty_i):
+                continue
+            t = parse_ts(row[ts_i])
+            q = parse_float(row[qty_i])
+            if t is None or not q:
+                continue
+            if current_ts is not None and t != current_ts:
+                if t < current_ts:
+                    raise ValueError(f"{positions_path} is not time-sorted at {fmt_ts(t)}")
+                yield current_ts, {u: (a[0], a[1], a[2]) for u, a in agg.items()}
+                agg = {}
+            current_ts = t
+
+            symbol = row[sym_i].strip()
+            if symbol not in size_cache:
+                spec = parse_option_symbol(symbol)
+                if spec is not None and missing_greeks:
+                    # Options without Greeks would silently contribute zero risk.
+                    raise ValueError(
+                        f"{positions_path}: option {symbol} but no {'/'.join(missing_greeks)} column "
+                        f"({greeks_unit} Greeks, e.g. {', '.join(columns[g][0] for g in missing_greeks)}); got {header}"
+                    )
+                size_cache[symbol] = spec.contract_size if spec is not None else linear_sizes.get(symbol, 1.0)
+
+            cached = greek_cache.get(symbol)
+            delta = _cell(row, d_i)
+            gamma = _cell(row, g_i)
+            vega = _cell(row, v_i)
+            if cached is not None:
+                delta = cached[0] if delta is None else delta
+                gamma = cached[1] if gamma is None else gamma
+                vega = cached[2] if vega is None else vega
+            if delta is None:
+                # Non-option legs without Greeks: quantity * ctVal is coin delta.
+                delta = 1.0 if parse_option_symbol(symbol) is None else 0.0
+            greeks = (delta, gamma or 0.0, vega or 0.0)
+            greek_cache[symbol] = greeks
+
+            exposure = q * size_cache[symbol]
+            a = agg.setdefault(underlying_of(symbol), [0.0, 0.0, 0.0])
+            a[0] += exposure * greeks[0]
+            a[1] += exposure * greeks[1]
+            a[2] += exposure * greeks[2]
+
+        if current_ts is not None:
+            yield current_ts, {u: (a[0], a[1], a[2]) for u, a in agg.items()}
+
+
+def _spot(index: dict[str | None, IndexSeries], underlying: str, t: float) -> float | None:
+    series = series_for(index, underlying)
+    if series is None:
+        return None
+    hit = series.asof(t)
+    return hit[1] if hit is not None else None
+
+
+def maintenance_margin(
+    grid: ScenarioGrid,
+    greeks_by_underlying: Greeks,
+    spots: dict[str, float],
+    greeks_unit: str = "usd",
+) -> tuple[float, str | None, str | None]:
+    """
+    MM (USD) = buffer * sum over underlyings of the worst grid loss.
+    Returns (mm, worst_underlying, worst_scenario_label).
+    """
+    total = 0.0
+    worst: tuple[float, str | None, str | None] = (0.0, None, None)
+    for underlying, (delta, gamma, vega) in greeks_by_underlying.items():
+        spot = spots[underlying]
+        if greeks_unit == "okx_pa":
+            vega *= spot  # PA x spot = USD (GreeksConverter.okx_pa_to_usd)
+        loss, k = grid.worst_loss(spot, delta, gamma, vega)
+        total += loss
+        if loss > worst[0]:
+            worst = (loss, underlying, grid.label(k))
+    return total * MM_BUFFER, worst[1], worst[2]
+
+
+def run_history(
+    positions_path: Path,
+    index: dict[str | None, IndexSeries],
+    equity: IndexSeries | None,
+    grid: ScenarioGrid,
+    greeks_unit: str = "usd",
+    nav_currency: str = "usd",
+    nav_underlying: str = "BTC",
+    linear_sizes: dict[str, float] | None = None,
+) -> list[MarginSnapshot]:
+    out: list[MarginSnapshot] = []
+    for t, greeks in iter_snapshots(positions_path, greeks_unit, linear_sizes):
+        spots: dict[str, float] = {}
+        for u in greeks:
+            s = _spot(index, u, t)
+            if s is not None:
+                spots[u] = s
+        missing = [u for u in greeks if u not in spots]
+        if missing:
+            LOGGER.warning("No index price for %s at %s; underlying skipped", missing, fmt_ts(t))
+            greeks = {u: g for u, g in greeks.items() if u in spots}
+
+        mm, worst_u, worst_k = maintenance_margin(grid, greeks, spots, greeks_unit)
+
+        equity_usd: float | None = None
+        hit = equity.asof(t) if equity is not None else None
+        if hit is not None:
+            equity_usd = hit[1]
+            if nav_currency == "coin":
+                spot = _spot(index, nav_underlying, t)
+                equity_usd = equity_usd * spot if spot is not None else None
+        ratio = (equity_usd / mm) if equity_usd is not None and mm > 0 else None
+        out.append(MarginSnapshot(t, equity_usd, mm, ratio, worst_u, worst_k))
+    return out
+
+
+def summarize(history: list[MarginSnapshot]) -> dict:
+    rated = [(h, h.margin_ratio) for h in history if h.margin_ratio is not None]
+    events: list[dict] = []
+    in_breach = False
+    for h, ratio in rated:
+        breach = ratio <= LIQUIDATION_RATIO
+        if breach and not in_breach:
+            events.append(
+                {
+                    "timestamp": fmt_ts(h.ts),
+                    "margin_ratio": ratio,
+                    "equity_usd": h.equity_usd,
+                    "maintenance_margin_usd": h.maintenance_margin_usd,
+                    "worst_underlying": h.worst_underlying,
+                    "worst_scenario": h.worst_scenario,
+                }
+            )
+        in_breach = breach
+    worst = min(rated, key=lambda hr: hr[1]) if rated else None
+    return {
+        "snapshots": len(history),
+        "snapshots_with_equity": len(rated),
+        "min_margin_ratio": worst[1] if worst else None,
+        "min_margin_ratio_at": fmt_ts(worst[0].ts) if worst else None,
+        "max_maintenance_margin_usd": max((h.maintenance_margin_usd for h in history), default=0.0),
+        "liquidation_events": events,
+    }
+
+
+def _parse_shocks(raw: str) -> tuple[float, ...]:
+    return tuple(float(x) for x in raw.split(",") if x.strip())
+
+
+def _parse_contract_size(raw: str) -> tuple[str, float]:
+    symbol, sep, value = raw.partition("=")
+    if not sep or not symbol.strip():
+        raise argparse.ArgumentTypeError(f"expected SYMBOL=CTVAL, got {raw!r}")
+    return symbol.strip(), float(value)
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        description="OKX portfolio-margin stress: MM over a spot x vol grid per snapshot, min ratio, liquidations."
+    )
+    parser.add_argument("experiment_dir", type=Path, help="Experiment folder containing results/")
+    parser.add_argument("--index", type=Path, required=True, help="CSV with timestamp,[symbol],index_price")
+    parser.add_argument(
+        "--positions", type=Path, default=None, help="Position history (default: results/positions.csv)"
+    )
+    parser.add_argument(
+        "--greeks-unit", choices=["usd", "okx_pa"], default="usd", help="Greek convention of positions"
+    )
+    parser.add_argument("--nav-currency", choices=["usd", "coin"], default="usd", help="Unit of nav.csv equity")
+    parser.add_argument("--nav-underlying", default="BTC", help="Coin of a coin-denominated NAV (default: BTC)")
+    parser.add_argument(
+        "--spot-shocks",
+        type=_parse_shocks,
+        default=DEFAULT_SPOT_SHOCKS,
+        help="Comma-separated relative spot shocks (default: ±15%% grid)",
+    )
+    parser.add_argument(
+        "--vol-shocks",
+        type=_parse_shocks,
+        default=DEFAULT_VOL_SHOCKS,
+        help="Comma-separated IV-point shocks (default: -20,-10,0,10,20)",
+    )
+    parser.add_argument(
+        "--linear-contract-size",
+        type=_parse_contract_size,
+        action="append",
+        default=[],
+        metavar="SYMBOL=CTVAL",
+        help="Coin per contract for a non-option symbol (repeatable); default 1.0, i.e. quantity in coin",
+    )
+    parser.add_argument("--at", default=None, help="Print the full scenario grid for the snapshot at/before this time")
+    args = parser.parse_args()
+
+    exp_dir = args.experiment_dir.expanduser().resolve()
+    positions_path = (args.positions or exp_dir / "results/positions.csv").expanduser().resolve()
+    if resolve_result_path(positions_path) is None:
+        LOGGER.error("Missing positions: %s", positions_path)
+        return 1
+
+    grid = ScenarioGrid.build(args.spot_shocks, args.vol_shocks)
+    linear_sizes = dict(args.linear_contract_size)
+    index = load_index_by_underlying(args.index.expanduser().resolve())
+    nav_path = exp_dir / "results/nav.csv"
+    equity = load_equity(nav_path) if resolve_result_path(nav_path) is not None else None
+
+    if args.at is not None:
+        at = parse_ts(args.at)
+        if at is None:
+            LOGGER.error("Invalid --at timestamp: %s", args.at)
+            return 1
+        snapshot = None
+        for t, greeks in iter_snapshots(positions_path, args.greeks_unit, linear_sizes):
+            if t > at:
+                break
+            snapshot = (t, greeks)
+        if snapshot is None:
+            LOGGER.error("No snapshot at/before %s", args.at)
+            return 1
+        t, greeks = snapshot
+        for u, (delta, gamma, vega) in sorted(greeks.items()):
+            spot = _spot(index, u, t)
+            if spot is None:
+                LOGGER.warning("No index price for %s", u)
+                continue
+            vega_usd = vega * spot if args.greeks_unit == "okx_pa" else vega
+            pnl = grid.pnl(spot, delta, gamma, vega_usd)
+            print(f"{u} @ {fmt_ts(t)} spot={spot:,.2f} delta={delta:.4f} gamma={gamma:.3g} vega={vega_usd:,.2f} USD")
+            print("spot\\vol " + " ".join(f"{v:>+12g}" for v in grid.vol_shocks))
+            n = len(grid.vol_shocks)
+            for i, s in enumerate(grid.spot_shocks):
+                print(f"{s:>+8.0%} " + " ".join(f"{x:>12,.0f}" for x in pnl[i * n : (i + 1) * n]))
+        return 0
+
+    t0 = time.perf_counter()
+    history = run_history(
+        positions_path,
+        index,
+        equity,
+        grid,
+        greeks_unit=args.greeks_unit,
+        nav_currency=args.nav_currency,
+        nav_underlying=args.nav_underlying.upper(),
+        linear_sizes=linear_sizes,
+    )
+    summary = summarize(history)
+    summary["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+    summary["grid"] = {"spot_shocks": list(grid.spot_shocks), "vol_shocks": list(grid.vol_shocks), "buffer": MM_BUFFER}
+
+    out_csv = exp_dir / "results/margin_history.csv"
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with out_csv.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(
+            ["timestamp", "equity_usd", "maintenance_margin_usd", "margin_ratio", "worst_underlying", "worst_scenario"]
+        )
+        for h in history:
+            w.writerow(
+                [
+                    fmt_ts(h.ts),
+                    h.equity_usd,
+                    h.maintenance_margin_usd,
+                    h.margin_ratio,
+                    h.worst_underlying,
+                    h.worst_scenario,
+                ]
+            )
+    out_json = exp_dir / "results/margin_report.json"
+    out_json.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+    LOGGER.info(
+        "Snapshots=%d min_margin_ratio=%s at %s liquidation_events=%d (%.2fs)",
+        summary["snapshots"],
+        f"{summary['min_margin_ratio']:.3f}" if summary["min_margin_ratio"] is not None else "n/a",
+        summary["min_margin_ratio_at"],
+        len(summary["liquidation_events"]),
+        summary["elapsed_sec"],
+    )
+    LOGGER.info("Wrote: %s", out_csv)
+    LOGGER.info("Wrote: %s", out_json)
+    return 2 if summary["liquidation_events"] else 0
+
+
+def main() -> int:
+    _configure_logging()
+    try:
+        return _main()
+    except ValueError as e:
+        LOGGER.error("%s", e)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
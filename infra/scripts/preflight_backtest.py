@@ -4,10 +4,26 @@ import argparse
 import csv
 import json
 import logging
+import statistics
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
+from archive_experiments import ResultReadError, open_result_csv, resolve_result_path
+from backtest_io import (
+    ASK_COLUMNS,
+    BID_COLUMNS,
+    PRICE_COLUMNS,
+    SIGNAL_TS_COLUMNS,
+    SYMBOL_COLUMNS,
+    TS_COLUMNS,
+    find_col,
+    fmt_ts,
+    parse_float,
+    parse_ts,
+)
+from option_settlement import find_positions_past_expiry, parse_option_symbol
+
 
 LOGGER = logging.getLogger("preflight_backtest")
 
@@ -24,6 +40,15 @@ REQUIRED_RESULTS = [
 SUSPICIOUS_SHARPE = 10.0
 
 
+FILL_PRICE_TOL = 1e-9  # relative
+
+
+# NAV / market data period = median of the first N timestamp steps. A trade may lie up to one
+# period outside the NAV track (daily NAV keyed by date, NAV stamped at bar close) or after
+# the last market data bar (that bar's quote is still current).
+PERIOD_SAMPLE_STEPS = 1000
+
+
 @dataclass(frozen=True)
 class CheckResult:
     name: str
@@ -36,7 +61,7 @@ def _configure_logging() -> None:
 
 
 def _read_csv_head(path: Path, n: int = 5) -> tuple[list[str], list[dict[str, str]]]:
-    with path.open("r", encoding="utf-8") as f:
+    with open_result_csv(path) as f:
         reader = csv.DictReader(f)
         rows: list[dict[str, str]] = []
         for _, row in zip(range(n), reader, strict=False):
@@ -48,7 +73,7 @@ def _read_nav(path: Path, max_rows: int = 200000) -> list[float]:
     # Expect columns: timestamp-like + nav-equity-like. We accept many names.
     candidates = {"nav", "equity", "portfolio_value", "value"}
     values: list[float] = []
-    with path.open("r", encoding="utf-8") as f:
+    with open_result_csv(path) as f:
         reader = csv.DictReader(f)
         if not reader.fieldnames:
             return values
@@ -90,11 +115,13 @@ def check_required_files(experiment_dir: Path) -> list[CheckResult]:
     results: list[CheckResult] = []
     for rel in REQUIRED_RESULTS:
         p = experiment_dir / rel
+        # Archived experiments keep CSVs as .csv.gz / .parquet (see archive_experiments.py).
+        resolved = resolve_result_path(p) if p.suffix == ".csv" else (p if p.exists() else None)
         results.append(
             CheckResult(
                 name=f"required:{rel}",
-                ok=p.exists() and p.is_file(),
-                detail=str(p),
+                ok=resolved is not None and resolved.is_file(),
+                detail=str(resolved or p),
             )
         )
     return results
@@ -102,7 +129,7 @@ def check_required_files(experiment_dir: Path) -> list[CheckResult]:
 
 def check_nav_mtm(experiment_dir: Path) -> list[CheckResult]:
     nav_path = experiment_dir / "results/nav.csv"
-    if not nav_path.exists():
+    if resolve_result_path(nav_path) is None:
         return [CheckResult("mtm:nav_exists", False, str(nav_path))]
 
     nav = _read_nav(nav_path)
@@ -173,6 +200,294 @@ def check_metrics_sanity(experiment_dir: Path) -> list[CheckResult]:
     return res
 
 
+def _median_step(steps: list[float]) -> float:
+    positive = [d for d in steps if d > 0]
+    return statistics.median(positive) if positive else 0.0
+
+
+def _nav_time_range(nav_path: Path) -> tuple[float, float, float] | None:
+    """(first_ts, last_ts, period) of the NAV track."""
+    first: float | None = None
+    last: float | None = None
+    steps: list[float] = []
+    with open_result_csv(nav_path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return None
+        ts_i = find_col(header, TS_COLUMNS)
+        ts_i = 0 if ts_i is None else ts_i
+        for row in reader:
+            if len(row) <= ts_i:
+                continue
+            ts = parse_ts(row[ts_i])
+            if ts is None:
+                continue
+            if first is None:
+                first = ts
+            elif last is not None and len(steps) < PERIOD_SAMPLE_STEPS:
+                steps.append(ts - last)
+            last = ts
+    if first is None or last is None:
+        return None
+    return first, last, _median_step(steps)
+
+
+class _Violations:
+    def __init__(self, max_examples: int = 5) -> None:
+        self.count = 0
+        self.examples: list[str] = []
+        self.max_examples = max_examples
+
+    def add(self, example: str) -> None:
+        self.count += 1
+        if len(self.examples) < self.max_examples:
+            self.examples.append(example)
+
+    def result(self, name: str, ok_detail: str) -> CheckResult:
+        if self.count == 0:
+            return CheckResult(name, True, ok_detail)
+        return CheckResult(name, False, f"{self.count} violation(s); e.g. " + "; ".join(self.examples))
+
+
+class _AsOfQuotes:
+    """
+    Streaming as-of view over a time-sorted market data CSV (timestamp,[symbol],bid,ask).
+    advance(ts) consumes every bar <= ts; get(symbol) returns that symbol's latest (bid, ask).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._file = open_result_csv(path)
+        self._reader = csv.reader(self._file)
+        header = next(self._reader, None) or []
+        self._ts_i = find_col(header, TS_COLUMNS)
+        self._sym_i = find_col(header, SYMBOL_COLUMNS)
+        self._bid_i = find_col(header, BID_COLUMNS)
+        self._ask_i = find_col(header, ASK_COLUMNS)
+        self.has_columns = None not in (self._ts_i, self._bid_i, self._ask_i)
+        self.unsorted = False
+        self.first_ts: float | None = None
+        self._last_ts = float("-inf")
+        self._steps: list[float] = []
+        self._quotes: dict[str | None, tuple[float, float]] = {}
+        self._pending = self._next() if self.has_columns else None
+
+    @property
+    def usable(self) -> bool:
+        return self.has_columns and not self.unsorted
+
+    def _next(self) -> tuple[float, str | None, float, float] | None:
+        assert self._ts_i is not None and self._bid_i is not None and self._ask_i is not None
+        width = max(self._ts_i, self._bid_i, self._ask_i) + 1
+        for row in self._reader:
+            if len(row) < width:
+                continue
+            ts = parse_ts(row[self._ts_i])
+            bid = parse_float(row[self._bid_i])
+            ask = parse_float(row[self._ask_i])
+            if ts is None or bid is None or ask is None:
+                continue
+            if ts < self._last_ts:
+                self.unsorted = True
+                return None
+            if self.first_ts is not None and len(self._steps) < PERIOD_SAMPLE_STEPS:
+                self._steps.append(ts - self._last_ts)
+            self._last_ts = ts
+            if self.first_ts is None:
+                self.first_ts = ts
+            sym = row[self._sym_i].strip() if self._sym_i is not None and len(row) > self._sym_i else None
+            return ts, sym, bid, ask
+        return None
+
+    def advance(self, ts: float) -> None:
+        while self._pending is not None and self._pending[0] <= ts:
+            _, sym, bid, ask = self._pending
+            self._quotes[sym] = (bid, ask)
+            self._pending = self._next()
+
+    def past_end(self, ts: float) -> float | None:
+        """Last bar's timestamp if ts is more than one bar period after it (data ran out), else None."""
+        if self._pending is not None or self.first_ts is None:
+            return None
+        return self._last_ts if ts > self._last_ts + _median_step(self._steps) else None
+
+    def get(self, symbol: str | None) -> tuple[float, float] | None:
+        # Single-instrument market data (no symbol column) applies to every trade.
+        return self._quotes.get(symbol if self._sym_i is not None else None)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def check_timestamp_integrity(experiment_dir: Path, market_data_path: Path | None = None) -> list[CheckResult]:
+    """
+    Lookahead / leakage checks over trades.csv in one linear pass.
+
+    - signal_before_fill: trade timestamp must not precede its signal timestamp
+    - within_nav_range: trades must fall inside the NAV track, give or take one NAV period
+    - within_market_data: trades must not precede the first market data bar or come more
+      than one bar period after the last one (stale quotes)
+    - fill_within_bid_ask: fill price inside the as-of bar's [bid, ask]
+    - no_expired_options: no trades on options at/after 08:00 UTC expiry
+
+    Market data (optional) is as-of joined with a sorted merge, so both files must be
+    time-sorted; unsorted input is itself reported as a failure.
+    """
+    trades_path = experiment_dir / "results/trades.csv"
+    if resolve_result_path(trades_path) is None:
+        return [CheckResult("lookahead:trades_exists", False, str(trades_path))]
+
+    nav_path = experiment_dir / "results/nav.csv"
+    nav_range = _nav_time_range(nav_path) if resolve_result_path(nav_path) is not None else None
+
+    if market_data_path is None:
+        default_md = experiment_dir / "results/market_data.csv"
+        market_data_path = default_md if resolve_result_path(default_md) is not None else None
+
+    signal_v = _Violations()
+    nav_v = _Violations()
+    md_range_v = _Violations()
+    bidask_v = _Violations()
+    expiry_v = _Violations()
+    order_v = _Violations()
+    ts_v = _Violations()
+    option_symbols: set[str] = set()
+
+    md = _AsOfQuotes(market_data_path) if market_data_path is not None else None
+    try:
+        with open_result_csv(trades_path) as f:
+            reader = csv.reader(f)
+            header = next(reader, None) or []
+            ts_i = find_col(header, TS_COLUMNS)
+            sig_i = find_col(header, SIGNAL_TS_COLUMNS)
+            sym_i = find_col(header, SYMBOL_COLUMNS)
+            px_i = find_col(header, PRICE_COLUMNS)
+            bid_i = find_col(header, BID_COLUMNS)
+            ask_i = find_col(header, ASK_COLUMNS)
+            if ts_i is None:
+                return [CheckResult("lookahead:trades_timestamp", False, f"no timestamp column in {header}")]
+
+            prev_ts = float("-inf")
+            n_rows = 0
+            for line_no, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                ts = parse_ts(row[ts_i]) if len(row) > ts_i else None
+                if ts is None:
+                    # Rows that can't be placed in time can't be checked for lookahead either.
+                    raw = row[ts_i] if len(row) > ts_i else None
+                    ts_v.add(f"line {line_no} unparseable timestamp {raw!r}" if raw else f"line {line_no} no timestamp")
+                    continue
+                n_rows += 1
+                if ts < prev_ts:
+                    order_v.add(f"line {line_no} {fmt_ts(ts)} < {fmt_ts(prev_ts)}")
+                prev_ts = max(prev_ts, ts)
+                sym = row[sym_i].strip() if sym_i is not None and len(row) > sym_i else None
+                px = parse_float(row[px_i]) if px_i is not None and len(row) > px_i else None
+
+                if sig_i is not None and len(row) > sig_i and row[sig_i] != row[ts_i]:
+                    sig_ts = parse_ts(row[sig_i])
+                    if sig_ts is not None and ts < sig_ts:
+                        signal_v.add(f"line {line_no} fill {fmt_ts(ts)} < signal {fmt_ts(sig_ts)}")
+
+                if nav_range is not None and not (nav_range[0] - nav_range[2] <= ts <= nav_range[1] + nav_range[2]):
+                    nav_v.add(f"line {line_no} {fmt_ts(ts)}")
+
+                spec = parse_option_symbol(sym) if sym is not None else None
+                if spec is not None:
+                    option_symbols.add(spec.symbol)
+                    expiry_ts = spec.expiry_ts
+                    if ts >= expiry_ts:
+                        expiry_v.add(f"line {line_no} {sym} traded {fmt_ts(ts)} (expired {fmt_ts(expiry_ts)})")
+
+                # As-of quote: the trade row's own bid/ask wins, else the latest market data bar <= ts.
+                quote: tuple[float, float] | None = None
+                if bid_i is not None and ask_i is not None and len(row) > max(bid_i, ask_i):
+                    bid = parse_float(row[bid_i])
+                    ask = parse_float(row[ask_i])
+                    if bid is not None and ask is not None:
+                        quote = (bid, ask)
+                if md is not None and md.usable:
+                    md.advance(ts)
+                    if md.first_ts is not None and ts < md.first_ts:
+                        md_range_v.add(f"line {line_no} {fmt_ts(ts)} < first bar {fmt_ts(md.first_ts)}")
+                    last_bar = md.past_end(ts)
+                    if last_bar is not None:
+                        md_range_v.add(f"line {line_no} {fmt_ts(ts)} after last bar {fmt_ts(last_bar)}")
+                    if quote is None:
+                        quote = md.get(sym)
+
+                if quote is not None and px is not None:
+                    bid, ask = quote
+                    tol = FILL_PRICE_TOL * max(abs(bid), abs(ask), 1.0)
+                    if px < bid - tol or px > ask + tol:
+                        bidask_v.add(f"line {line_no} {sym or ''} px={px} outside [{bid}, {ask}]")
+    finally:
+        if md is not None:
+            md.close()
+
+    res = [
+        ts_v.result("lookahead:trades_timestamp", f"rows={n_rows}"),
+        order_v.result("lookahead:trades_sorted", f"rows={n_rows}"),
+        signal_v.result(
+            "lookahead:signal_before_fill",
+            "ok" if sig_i is not None else "skipped (no signal_timestamp column)",
+        ),
+        nav_v.result(
+            "lookahead:within_nav_range",
+            (
+                f"nav={fmt_ts(nav_range[0])}..{fmt_ts(nav_range[1])} ± {nav_range[2]:g}s"
+                if nav_range
+                else "skipped (no nav timestamps)"
+            ),
+        ),
+        expiry_v.result("lookahead:no_expired_options", f"options={len(option_symbols)}"),
+    ]
+    if md is not None and not md.has_columns:
+        res.append(CheckResult("lookahead:market_data_columns", False, f"{market_data_path}: need timestamp,bid,ask"))
+    elif md is not None and md.unsorted:
+        res.append(CheckResult("lookahead:market_data_sorted", False, f"{market_data_path} is not time-sorted"))
+    elif md is not None:
+        res.append(md_range_v.result("lookahead:within_market_data", f"market_data={market_data_path}"))
+    have_quotes = (md is not None and md.has_columns) or (bid_i is not None and ask_i is not None)
+    res.append(
+        bidask_v.result(
+            "lookahead:fill_within_bid_ask",
+            "ok" if have_quotes and px_i is not None else "skipped (no price or bid/ask data)",
+        )
+    )
+    return res
+
+
+def check_expired_positions(experiment_dir: Path) -> list[CheckResult]:
+    """
+    Options must leave positions.csv at their 08:00 UTC expiry (settled, not carried at last mark).
+    Use option_settlement.py to compute the corrected NAV when this fails.
+    """
+    positions_path = experiment_dir / "results/positions.csv"
+    if resolve_result_path(positions_path) is None:
+        return [CheckResult("settlement:positions_exists", False, str(positions_path))]
+    try:
+        stale = find_positions_past_expiry(positions_path)
+    except ResultReadError:
+        raise
+    except ValueError as e:
+        # Unknown layout: nothing to check, like signal_before_fill without a signal column.
+        return [CheckResult("settlement:no_positions_past_expiry", True, f"skipped ({e})")]
+    if not stale:
+        return [CheckResult("settlement:no_positions_past_expiry", True, "ok")]
+    examples = [
+        f"{sym} x{n} rows from {fmt_ts(first)}" for sym, (n, first) in sorted(stale.items(), key=lambda kv: kv[1][1])
+    ][:5]
+    return [
+        CheckResult(
+            "settlement:no_positions_past_expiry",
+            False,
+            f"{len(stale)} option(s) held past expiry; e.g. " + "; ".join(examples),
+        )
+    ]
+
+
 def write_report(experiment_dir: Path, checks: list[CheckResult]) -> Path:
     report = {
         "experiment_dir": str(experiment_dir),
@@ -185,21 +500,44 @@ def write_report(experiment_dir: Path, checks: list[CheckResult]) -> Path:
     return out_path
 
 
-def main() -> int:
+def run_preflight(experiment_dir: Path, market_data_path: Path | None = None) -> list[CheckResult]:
+    """
+    Run every preflight check on one experiment (no logging, no report written).
+    """
+    checks: list[CheckResult] = []
+    for prefix, check in (
+        ("required", lambda: check_required_files(experiment_dir)),
+        ("mtm", lambda: check_nav_mtm(experiment_dir)),
+        ("metrics", lambda: check_metrics_sanity(experiment_dir)),
+        ("lookahead", lambda: check_timestamp_integrity(experiment_dir, market_data_path)),
+        ("settlement", lambda: check_expired_positions(experiment_dir)),
+    ):
+        try:
+            checks.extend(check())
+        except ResultReadError as e:
+            checks.append(CheckResult(f"{prefix}:readable", False, str(e)))
+    return checks
+
+
+def main(argv: list[str] | None = None) -> int:
     _configure_logging()
     parser = argparse.ArgumentParser(description="Backtest preflight: artifacts + MTM/metrics sanity.")
     parser.add_argument("experiment_dir", type=Path, help="Path to an experiment folder containing results/")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--market-data",
+        type=Path,
+        default=None,
+        help="Time-sorted CSV with timestamp,[symbol],bid,ask bars (default: results/market_data.csv if present)",
+    )
+    args = parser.parse_args(argv)
 
     exp_dir = args.experiment_dir.expanduser().resolve()
     if not exp_dir.exists() or not exp_dir.is_dir():
         LOGGER.error("Invalid experiment_dir: %s", exp_dir)
         return 1
 
-    checks: list[CheckResult] = []
-    checks.extend(check_required_files(exp_dir))
-    checks.extend(check_nav_mtm(exp_dir))
-    checks.extend(check_metrics_sanity(exp_dir))
+    market_data = args.market_data.expanduser().resolve() if args.market_data else None
+    checks = run_preflight(exp_dir, market_data)
 
     ok = all(c.ok for c in checks)
     for c in checks:
@@ -17,112 +17,139 @@ DEFAULT_DIRS = [
 ]
 
 
+GITIGNORE_BASELINE = [
+    "# --- generated by /home/sqr/_meta/project_guard.py ---",
+    "__pycache__/",
+    "*.pyc",
+    ".pytest_cache/",
+    ".ruff_cache/",
+    ".mypy_cache/",
+    ".ipynb_checkpoints/",
+    ".DS_Store",
+    "scratch/**/outputs/",
+    "scratch/**/tmp/",
+    "experiments/**/logs/",
+    "experiments/**/results/*.parquet",
+    "experiments/**/results/*.pkl",
+    "experiments/**/results/*.db",
+    "",
+]
+
+
+EXPERIMENT_README_STUB = "\n".join(
+    [
+        "# Experiments",
+        "",
+        "## Rule",
+        "- Every experiment lives in its own folder: `YYYY-MM-DD_short_desc/`",
+        "- Phase 1 first (single-effect), then Phase 2 (joint) after Phase 1 completes",
+        "- Always write artifacts to `results/` (trades/positions/nav/metrics/reconciliation)",
+        "",
+        "## Quick Start",
+        "1) Create experiment folder",
+        "2) Write `README.md` (hypothesis, isolated variable, baseline, expected signal, failure condition)",
+        "3) Run backtest",
+        "4) Run preflight: `/home/sqr/_meta/preflight_backtest.py <experiment_dir>`",
+        "",
+    ]
+) + "\n"
+
+
 def _configure_logging() -> None:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
 
 
-def ensure_dirs(project_root: Path) -> list[Path]:
+def ensure_dirs(project_root: Path, dry_run: bool = False) -> list[Path]:
     created: list[Path] = []
     for rel in DEFAULT_DIRS:
         p = project_root / rel
         if p.exists():
             continue
-        p.mkdir(parents=True, exist_ok=True)
+        if not dry_run:
+            p.mkdir(parents=True, exist_ok=True)
         created.append(p)
     return created
 
 
-def ensure_gitignore(project_root: Path) -> bool:
+def _gitignore_additions(existing: str) -> list[str]:
+    existing_set = set(line.strip() for line in existing.splitlines() if line.strip())
+    return [line for line in GITIGNORE_BASELINE if line.strip() and line.strip() not in existing_set]
+
+
+def render_gitignore(existing: str | None) -> str | None:
+    """
+    Return the full .gitignore text after applying the baseline, or None if unchanged.
+    Used for dry-run diffs; ensure_gitignore appends the same lines in place.
+    """
+    if existing is None:
+        return "\n".join(GITIGNORE_BASELINE) + "\n"
+    to_add = _gitignore_additions(existing)
+    if not to_add:
+        return None
+    return existing + "\n" + "\n".join(to_add) + "\n"
+
+
+def ensure_gitignore(project_root: Path, dry_run: bool = False) -> bool:
     """
     Non-destructive:
     - If .gitignore missing: create minimal one
-    - If exists: append missing patterns once
+    - If exists: append missing patterns once (existing bytes and line endings untouched)
     """
     gi = project_root / ".gitignore"
-    baseline = [
-        "# --- generated by /home/sqr/_meta/project_guard.py ---",
-        "__pycache__/",
-        "*.pyc",
-        ".pytest_cache/",
-        ".ruff_cache/",
-        ".mypy_cache/",
-        ".ipynb_checkpoints/",
-        ".DS_Store",
-        "scratch/**/outputs/",
-        "scratch/**/tmp/",
-        "experiments/**/logs/",
-        "experiments/**/results/*.parquet",
-        "experiments/**/results/*.pkl",
-        "experiments/**/results/*.db",
-        "",
-    ]
-
     if not gi.exists():
-        gi.write_text("\n".join(baseline) + "\n", encoding="utf-8")
+        if not dry_run:
+            gi.write_text("\n".join(GITIGNORE_BASELINE) + "\n", encoding="utf-8")
         return True
 
-    existing = gi.read_text(encoding="utf-8").splitlines()
-    existing_set = set(line.strip() for line in existing if line.strip())
-    to_add = [line for line in baseline if line.strip() and line.strip() not in existing_set]
+    raw = gi.read_bytes()
+    to_add = _gitignore_additions(raw.decode("utf-8"))
     if not to_add:
         return False
-
-    with gi.open("a", encoding="utf-8") as f:
-        f.write("\n")
-        f.write("\n".join(to_add))
-        f.write("\n")
+    if not dry_run:
+        newline = "\r\n" if b"\r\n" in raw else "\n"
+        with gi.open("a", encoding="utf-8", newline=newline) as f:
+            f.write("\n")
+            f.write("\n".join(to_add))
+            f.write("\n")
     return True
 
 
-def ensure_experiment_readme_stub(project_root: Path) -> bool:
+def ensure_experiment_readme_stub(project_root: Path, dry_run: bool = False) -> bool:
     exp_readme = project_root / "experiments" / "README.md"
     if exp_readme.exists():
         return False
-    content = "\n".join(
-        [
-            "# Experiments",
-            "",
-            "## Rule",
-            "- Every experiment lives in its own folder: `YYYY-MM-DD_short_desc/`",
-            "- Phase 1 first (single-effect), then Phase 2 (joint) after Phase 1 completes",
-            "- Always write artifacts to `results/` (trades/positions/nav/metrics/reconciliation)",
-            "",
-            "## Quick Start",
-            "1) Create experiment folder",
-            "2) Write `README.md` (hypothesis, isolated variable, baseline, expected signal, failure condition)",
-            "3) Run backtest",
-            "4) Run preflight: `/home/sqr/_meta/preflight_backtest.py <experiment_dir>`",
-            "",
-        ]
-    )
-    exp_readme.write_text(content + "\n", encoding="utf-8")
+    if not dry_run:
+        exp_readme.write_text(EXPERIMENT_README_STUB, encoding="utf-8")
     return True
 
 
-def main() -> int:
+def main(argv: list[str] | None = None) -> int:
     _configure_logging()
     parser = argparse.ArgumentParser(description="Non-destructive project hygiene + structure guard.")
     parser.add_argument("project_root", type=Path, help="Absolute path to project root")
-    args = parser.parse_args()
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args(argv)
 
     root = args.project_root.expanduser().resolve()
     if not root.exists() or not root.is_dir():
         LOGGER.error("Invalid project root: %s", root)
         return 1
 
-    created_dirs = ensure_dirs(root)
+    created_verb = "Would create" if args.dry_run else "Created"
+
+    created_dirs = ensure_dirs(root, dry_run=args.dry_run)
     for p in created_dirs:
-        LOGGER.info("Created dir: %s", p)
+        LOGGER.info("%s dir: %s", created_verb, p)
     if not created_dirs:
         LOGGER.info("Dirs: no changes needed.")
 
-    if ensure_gitignore(root):
-        LOGGER.info("Updated .gitignore")
+    if ensure_gitignore(root, dry_run=args.dry_run):
+        LOGGER.info("%s .gitignore", "Would update" if args.dry_run else "Updated")
     else:
         LOGGER.info(".gitignore: no changes needed.")
 
-    if ensure_experiment_readme_stub(root):
-        LOGGER.info("Created experiments/README.md")
+    if ensure_experiment_readme_stub(root, dry_run=args.dry_run):
+        LOGGER.info("%s experiments/README.md", created_verb)
     else:
         LOGGER.info("experiments/README.md: exists.")
 
@@ -0,0 +1,298 @@
+"""
+qkb: single front end for the _meta scripts.
+
+    qkb preflight <experiment_dir> [--market-data quotes.csv]
+    qkb guard <project_root> [--dry-run]
+    qkb bootstrap <project_root> [--meta-root ...] [--dry-run]
+    qkb greeks <value>... --from okx_pa --to usd --greek theta --price 88500
+
+Only os/sys are imported at startup; a subcommand's module is imported when that
+subcommand runs. For many calls in a row (sweeps), start a daemon once and route
+calls through it so they skip module imports:
+
+    qkb daemon start &
+    QKB_DAEMON=1 qkb preflight <experiment_dir>     # or: qkb --daemon preflight ...
+
+The daemon pre-imports every subcommand module and forks one child per job. The
+client's stdin/stdout/stderr are passed over the Unix socket (SCM_RIGHTS), so
+output, cwd, environment and exit code match a local run. If the scripts change
+on disk, the daemon refuses the job, shuts down, and the client runs locally.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# name -> (module, one-line help). Modules are imported lazily by load_entry.
+COMMANDS: dict[str, tuple[str, str]] = {
+    "preflight": ("preflight_backtest", "Backtest preflight: artifacts, MTM/metrics sanity, lookahead scan"),
+    "guard": ("project_guard", "Non-destructive project structure + .gitignore guard"),
+    "bootstrap": ("bootstrap_project_state", "Create missing PROJECT_RULES.md / STATE.md from templates"),
+    "greeks": ("greeks_converter", "Convert Greeks between OKX PA/BS and Deribit units"),
+}
+
+
+EXIT_INTERRUPTED = 130
+
+
+FD_SIZE = 4  # sizeof(int) in SCM_RIGHTS payloads
+
+
+def _usage() -> str:
+    lines = [
+        "usage: qkb [--daemon | --local] <command> [args...]",
+        "",
+        "commands:",
+        *(f"  {name:<10} {help_}" for name, (_, help_) in COMMANDS.items()),
+        f"  {'daemon':<10} start | stop | status of the persistent worker (Unix socket)",
+        f"  {'bench':<10} Startup-time benchmark: per-script vs qkb vs qkb --daemon",
+        "",
+        "Run `qkb <command> --help` for command options. QKB_DAEMON=1 routes commands via the daemon;",
+        "QKB_SOCKET overrides the socket path.",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def socket_path() -> str:
+    explicit = os.environ.get("QKB_SOCKET")
+    if explicit:
+        return explicit
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, f"qkb-{os.getuid()}.sock")
+    return os.path.join(fallback_socket_dir(), "qkb.sock")
+
+
+def fallback_socket_dir() -> str:
+    """Per-user socket directory when there is no XDG_RUNTIME_DIR; the daemon keeps it 0700."""
+    return os.path.join("/tmp", f"qkb-{os.getuid()}")
+
+
+# ---------------------------------------------------------------------------
+# Local dispatch
+# ---------------------------------------------------------------------------
+
+
+def _greeks_search_path() -> list[str]:
+    roots = [
+        os.environ.get("QKB_KNOWLEDGE_ROOT", ""),
+        os.path.dirname(os.path.dirname(SCRIPT_DIR)),  # repo checkout: infra/scripts -> repo root
+        os.path.expanduser("~/knowledge"),  # server layout (see README "Core Idea")
+    ]
+    return [os.path.join(r, "exchanges", "_common") for r in roots if r]
+
+
+def _import_greeks_converter():
+    try:
+        import greeks_converter
+    except ImportError:
+        for candidate in _greeks_search_path():
+            if os.path.exists(os.path.join(candidate, "greeks_converter.py")):
+                sys.path.insert(0, candidate)
+                break
+        else:
+            raise ImportError(
+                "greeks_converter.py not found; set QKB_KNOWLEDGE_ROOT to the knowledge repo root"
+            ) from None
+        import greeks_converter
+    return greeks_converter
+
+
+def greeks_main(argv: list[str] | None = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description=COMMANDS["greeks"][1])
+    parser.add_argument("value", type=float, nargs="+", help="Greek value(s) to convert")
+    parser.add_argument("--from", dest="from_exchange", choices=["okx_pa", "okx_bs", "deribit"], required=True)
+    parser.add_argument("--to", dest="to_unit", choices=["usd", "btc"], required=True)
+    parser.add_argument("--greek", choices=["delta", "gamma", "theta", "vega", "rho"], required=True)
+    parser.add_argument("--price", type=float, required=True, help="Underlying price in USD (e.g. BTC index)")
+    args = parser.parse_args(argv)
+
+    greeks_converter = _import_greeks_converter()
+    try:
+        converter = greeks_converter.GreeksConverter(args.price)
+        for value in args.value:
+            print(f"{converter.convert(value, args.from_exchange, args.to_unit, args.greek):.10g}")
+    except ValueError as e:
+        print(f"qkb greeks: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def load_entry(command: str):
+    if command == "greeks":
+        _import_greeks_converter()
+        return greeks_main
+    import importlib
+
+    return importlib.import_module(COMMANDS[command][0]).main
+
+
+def run_local(command: str, args: list[str]) -> int:
+    sys.argv = [f"qkb {command}", *args]  # argparse derives `prog` from argv[0]
+    return load_entry(command)(args)
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+
+# Wire format: 4-byte big-endian length + marshal payload. marshal and _socket are C
+# modules, so the client avoids the json (-> re), socket (-> enum) and array import cost.
+# Both ends check SO_PEERCRED, so a socket squatted by another user is never used.
+
+
+def send_msg(sock, obj, fds: list[int] | None = None) -> None:
+    import _socket
+    import marshal
+
+    data = marshal.dumps(obj)
+    frame = len(data).to_bytes(4, "big") + data
+    if fds:
+        rights = b"".join(fd.to_bytes(FD_SIZE, sys.byteorder, signed=True) for fd in fds)
+        sent = sock.sendmsg([frame], [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, rights)])
+        frame = frame[sent:]
+    if frame:
+        sock.sendall(frame)
+
+
+def recv_exact(sock, n: int, head: bytes = b"") -> bytes:
+    buf = head
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed mid-message")
+        buf += chunk
+    return buf
+
+
+def recv_msg(sock):
+    """Next message, or None on a clean EOF."""
+    import marshal
+
+    first = sock.recv(4)
+    if not first:
+        return None
+    size = int.from_bytes(recv_exact(sock, 4, first), "big")
+    return marshal.loads(recv_exact(sock, size))
+
+
+def peer_uid(sock) -> int:
+    """uid of the process on the other end of a Unix socket (struct ucred: pid, uid, gid)."""
+    import _socket
+
+    cred = sock.getsockopt(_socket.SOL_SOCKET, _socket.SO_PEERCRED, 3 * FD_SIZE)
+    return int.from_bytes(cred[FD_SIZE : 2 * FD_SIZE], sys.byteorder)
+
+
+def connect(path: str):
+    """
+    Client socket connected to our own daemon. Raises OSError if there is none, and
+    PermissionError if the listener belongs to another user (it would get our stdio fds).
+    """
+    import _socket
+
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        uid = peer_uid(sock)
+        if uid != os.getuid():
+            raise PermissionError(f"{path} is served by uid {uid}, not {os.getuid()}; refusing to use it")
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _stdio_fds() -> list[int]:
+    fds = []
+    for fd in (0, 1, 2):
+        try:
+            os.fstat(fd)
+            fds.append(fd)
+        except OSError:
+            fds.append(os.open(os.devnull, os.O_RDWR))
+    return fds
+
+
+def run_remote(argv: list[str], path: str) -> int | None:
+    """
+    Run argv in the daemon. Returns the exit code, or None if the caller should run locally.
+    """
+    try:
+        sock = connect(path)
+    except PermissionError as e:
+        print(f"qkb: {e}; running locally", file=sys.stderr)
+        return None
+    except OSError as e:
+        print(f"qkb: no daemon at {path} ({e.strerror or e}); running locally", file=sys.stderr)
+        return None
+
+    pid = None
+    try:
+        send_msg(sock, {"op": "run", "argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}, _stdio_fds())
+        while True:
+            msg = recv_msg(sock)
+            if msg is None:
+                break
+            if "pid" in msg:
+                pid = msg["pid"]
+            elif "exit" in msg:
+                return int(msg["exit"])
+            elif msg.get("stale"):
+                print("qkb: scripts changed since the daemon started; daemon stopped, running locally", file=sys.stderr)
+                return None
+    except KeyboardInterrupt:
+        if pid is not None:
+            import signal
+
+            os.kill(pid, signal.SIGINT)
+        return EXIT_INTERRUPTED
+    except OSError:
+        pass
+    finally:
+        sock.close()
+    print("qkb: daemon closed the connection without an exit code", file=sys.stderr)
+    return 1
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    use_daemon = os.environ.get("QKB_DAEMON") == "1"
+    if argv[:1] in (["--daemon"], ["--local"]):
+        use_daemon = argv[0] == "--daemon"
+        argv = argv[1:]
+
+    if not argv or argv[0] in ("-h", "--help"):
+        sys.stdout.write(_usage())
+        return 0 if argv else 2
+    command, rest = argv[0], argv[1:]
+    if command in ("daemon", "bench"):
+        import qkb_daemon
+
+        return qkb_daemon.daemon_main(rest) if command == "daemon" else qkb_daemon.bench_main(rest)
+    if command not in COMMANDS:
+        sys.stderr.write(f"qkb: unknown command {command!r}\n\n" + _usage())
+        return 2
+
+    if use_daemon:
+        code = run_remote(argv, socket_path())
+        if code is not None:
+            return code
+    return run_local(command, rest)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,394 @@
+"""
+qkb daemon (persistent worker on a Unix socket) and startup benchmark.
+
+Imported by qkb.py only for `qkb daemon ...` / `qkb bench`, so everyday
+invocations never load or compile it.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+
+import qkb
+
+
+# ---------------------------------------------------------------------------
+# Daemon
+# ---------------------------------------------------------------------------
+
+
+def _watched_mtimes() -> dict[str, float]:
+    """mtime of every loaded module that lives next to qkb or is greeks_converter."""
+    watched: dict[str, float] = {}
+    for mod in list(sys.modules.values()):
+        path = getattr(mod, "__file__", None)
+        if not path:
+            continue
+        path = os.path.abspath(path)
+        if os.path.dirname(path) == qkb.SCRIPT_DIR or os.path.basename(path) == "greeks_converter.py":
+            try:
+                watched[path] = os.stat(path).st_mtime
+            except OSError:
+                continue
+    return watched
+
+
+def _exit_code(exc: SystemExit) -> int:
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _run_job(conn, fds: list[int], request: dict) -> int:
+    """Child side of a fork: adopt the client's stdio, cwd and env, then run the command."""
+    import logging
+    import signal
+    import traceback
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    for target, fd in zip((0, 1, 2), fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    qkb.send_msg(conn, {"pid": os.getpid()})
+
+    # Drop the daemon's log handler so the command's own basicConfig writes to the client's stderr.
+    logging.root.handlers.clear()
+    code = 1
+    try:
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        argv = request["argv"]
+        code = qkb.run_local(argv[0], argv[1:])
+    except SystemExit as e:
+        code = _exit_code(e)
+    except KeyboardInterrupt:
+        code = qkb.EXIT_INTERRUPTED
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        try:
+            qkb.send_msg(conn, {"exit": code})
+        except OSError:
+            pass
+    return code
+
+
+def _ensure_private_dir(path: str) -> None:
+    """
+    Create path 0700, or check that an existing one is a real directory owned by us
+    with no group/other access (anyone else could have pre-created it in /tmp).
+    """
+    import stat
+
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(
+            f"{path} must be a directory owned by uid {os.getuid()} with mode 0700 "
+            f"(found uid {st.st_uid}, mode {stat.filemode(st.st_mode)}); remove it or set QKB_SOCKET"
+        )
+
+
+def serve(path: str, idle_timeout: float = 0.0) -> int:
+    import logging
+    import marshal
+    import signal
+    import socket
+    import struct
+    import time
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    log = logging.getLogger("qkb.daemon")
+
+    if os.path.dirname(path) == qkb.fallback_socket_dir():
+        try:
+            _ensure_private_dir(os.path.dirname(path))
+        except PermissionError as e:
+            log.error("%s", e)
+            return 1
+    if os.path.exists(path):
+        try:
+            qkb.connect(path).close()
+            log.error("A daemon is already listening on %s", path)
+            return 1
+        except PermissionError as e:
+            log.error("%s", e)
+            return 1
+        except OSError:
+            os.unlink(path)  # stale socket file from a dead daemon
+
+    preloaded = []
+    for name in qkb.COMMANDS:
+        try:
+            qkb.load_entry(name)
+            preloaded.append(name)
+        except ImportError as e:
+            log.warning("Not preloaded: %s (%s)", name, e)
+    watched = _watched_mtimes()
+
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)  # socket is 0600: same-user clients only
+    try:
+        srv.bind(path)
+    finally:
+        os.umask(old_umask)
+    srv.listen(64)
+    srv.settimeout(1.0)
+
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    started = time.time()
+    last_job = time.monotonic()
+    jobs = 0
+    children: set[int] = set()
+    log.info("qkb daemon pid=%d listening on %s (preloaded: %s)", os.getpid(), path, ", ".join(preloaded))
+
+    try:
+        while not stopping:
+            for pid in list(children):
+                if os.waitpid(pid, os.WNOHANG)[0]:
+                    children.discard(pid)
+            if idle_timeout and not children and time.monotonic() - last_job > idle_timeout:
+                log.info("Idle for %.0fs; exiting", idle_timeout)
+                break
+            try:
+                conn, _ = srv.accept()
+            except socket.timeout:
+                continue
+            except InterruptedError:
+                continue
+
+            fds: list[int] = []
+            try:
+                conn.settimeout(5.0)
+                _, uid, _ = struct.unpack("3i", conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, 12))
+                if uid != os.getuid():
+                    log.warning("Rejected connection from uid=%d", uid)
+                    conn.close()
+                    continue
+                head, ancdata, _, _ = conn.recvmsg(4, socket.CMSG_SPACE(3 * qkb.FD_SIZE))
+                for level, kind, payload in ancdata:
+                    if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                        for i in range(0, len(payload) - qkb.FD_SIZE + 1, qkb.FD_SIZE):
+                            fds.append(int.from_bytes(payload[i : i + qkb.FD_SIZE], sys.byteorder, signed=True))
+                if not head:
+                    raise ConnectionError("empty request")
+                size = int.from_bytes(qkb.recv_exact(conn, 4, head), "big")
+                request = marshal.loads(qkb.recv_exact(conn, size))
+                conn.settimeout(None)
+            except (OSError, ValueError, EOFError, TypeError) as e:
+                log.warning("Bad request: %s", e)
+                for fd in fds:
+                    os.close(fd)
+                conn.close()
+                continue
+
+            op = request.get("op")
+            if op == "run":
+                stale = _watched_mtimes() != watched
+                if stale or (request.get("argv") or [""])[0] not in qkb.COMMANDS:
+                    qkb.send_msg(conn, {"stale": True} if stale else {"exit": 2})
+                    for fd in fds:
+                        os.close(fd)
+                    conn.close()
+                    if stale:
+                        log.info("Scripts changed on disk; exiting so the next start picks them up")
+                        break
+                    continue
+                for stream in (sys.stdout, sys.stderr):
+                    stream.flush()
+                pid = os.fork()
+                if pid == 0:
+                    srv.close()
+                    code = 1
+                    try:
+                        code = _run_job(conn, fds, request)
+                    finally:
+                        os._exit(code)
+                for fd in fds:
+                    os.close(fd)
+                conn.close()
+                children.add(pid)
+                jobs += 1
+                last_job = time.monotonic()
+            else:
+                for fd in fds:
+                    os.close(fd)
+                if op == "status":
+                    reply = {
+                        "pid": os.getpid(),
+                        "socket": path,
+                        "uptime_sec": round(time.time() - started, 1),
+                        "jobs": jobs,
+                        "running": len(children),
+                        "preloaded": preloaded,
+                    }
+                elif op == "stop":
+                    reply = {"ok": True}
+                    stopping = True
+                else:
+                    reply = {"ok": op == "ping"}
+                qkb.send_msg(conn, reply)
+                conn.close()
+    finally:
+        srv.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    log.info("qkb daemon stopped after %d job(s)", jobs)
+    return 0
+
+
+def daemon_main(argv: list[str]) -> int:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(prog="qkb daemon", description="Persistent qkb worker on a Unix socket.")
+    parser.add_argument("action", choices=["start", "stop", "status"])
+    parser.add_argument(
+        "--socket", default=None, help="Socket path (default: $QKB_SOCKET, $XDG_RUNTIME_DIR, else /tmp/qkb-<uid>/)"
+    )
+    parser.add_argument(
+        "--idle-timeout", type=float, default=0.0, help="start: exit after N seconds without jobs (0 = never)"
+    )
+    args = parser.parse_args(argv)
+    path = args.socket or qkb.socket_path()
+
+    if args.action == "start":
+        return serve(path, idle_timeout=args.idle_timeout)
+    try:
+        sock = qkb.connect(path)
+        try:
+            qkb.send_msg(sock, {"op": args.action})
+            reply = qkb.recv_msg(sock)
+        finally:
+            sock.close()
+    except PermissionError as e:
+        print(f"qkb: {e}", file=sys.stderr)
+        return 1
+    except OSError:
+        print(f"qkb: no daemon at {path}", file=sys.stderr)
+        return 1
+    print(json.dumps(reply, indent=2) if args.action == "status" else f"stopped: {path}")
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Startup benchmark
+# ---------------------------------------------------------------------------
+
+
+def _time_runs(cmd: list[str], runs: int, env: dict[str, str]) -> tuple[list[float], int]:
+    import subprocess
+    import time
+
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)  # warm the page cache
+    samples = []
+    code = 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        code = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env).returncode
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples, code
+
+
+def bench_main(argv: list[str]) -> int:
+    """
+    Wall-clock per invocation for the same preflight call made four ways:
+    bare interpreter, direct script, `qkb --local`, and `qkb --daemon` (temporary daemon).
+    """
+    import argparse
+    import json
+    import statistics
+    import subprocess
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(prog="qkb bench", description="Startup-time benchmark for qkb.")
+    parser.add_argument("--runs", type=int, default=20, help="Timed invocations per case (default: 20)")
+    parser.add_argument(
+        "--experiment", default=None, help="Preflight this experiment end-to-end (default: `preflight --help`)"
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    cmd_args = [os.path.abspath(args.experiment)] if args.experiment else ["--help"]
+    qkb_script = os.path.join(qkb.SCRIPT_DIR, "qkb.py")
+    tmpdir = tempfile.mkdtemp(prefix="qkb-bench-")
+    sock = os.path.join(tmpdir, "qkb.sock")
+    env = {**os.environ, "QKB_SOCKET": sock}
+    env.pop("QKB_DAEMON", None)
+
+    cases = [
+        ("python -c pass", [sys.executable, "-c", "pass"]),
+        ("preflight_backtest.py", [sys.executable, os.path.join(qkb.SCRIPT_DIR, "preflight_backtest.py"), *cmd_args]),
+        ("qkb --local", [sys.executable, qkb_script, "--local", "preflight", *cmd_args]),
+        ("qkb --daemon", [sys.executable, qkb_script, "--daemon", "preflight", *cmd_args]),
+    ]
+
+    daemon = subprocess.Popen(
+        [sys.executable, qkb_script, "daemon", "start", "--socket", sock],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    results = []
+    try:
+        deadline = time.monotonic() + 10.0
+        while not os.path.exists(sock):
+            if daemon.poll() is not None or time.monotonic() > deadline:
+                print("qkb bench: daemon failed to start", file=sys.stderr)
+                return 1
+            time.sleep(0.02)
+
+        for label, cmd in cases:
+            samples, code = _time_runs(cmd, args.runs, env)
+            samples.sort()
+            results.append(
+                {
+                    "case": label,
+                    "median_ms": round(statistics.median(samples), 2),
+                    "p90_ms": round(samples[min(len(samples) - 1, int(0.9 * len(samples)))], 2),
+                    "min_ms": round(samples[0], 2),
+                    "exit_code": code,
+                }
+            )
+    finally:
+        daemon.terminate()
+        daemon.wait()
+        for leftover in (sock,):
+            if os.path.exists(leftover):
+                os.unlink(leftover)
+        os.rmdir(tmpdir)
+
+    if args.json:
+        print(json.dumps({"runs": args.runs, "args": cmd_args, "results": results}, indent=2))
+        return 0
+    print(f"preflight {' '.join(cmd_args)}  ({args.runs} runs each)")
+    print(f"{'case':<24}{'median ms':>12}{'p90 ms':>10}{'min ms':>10}{'exit':>6}")
+    for r in results:
+        print(f"{r['case']:<24}{r['median_ms']:>12.1f}{r['p90_ms']:>10.1f}{r['min_ms']:>10.1f}{r['exit_code']:>6}")
+    return 0
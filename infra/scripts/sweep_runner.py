@@ -0,0 +1,658 @@
+"""
+Parameter-sweep / walk-forward orchestrator with preflight gating.
+
+Expands a JSON sweep spec (grid x walk-forward folds) into dated experiment
+folders, runs the backtest command for each on a bounded local process pool
+with per-run resource limits, and runs preflight on every run as soon as it
+finishes. Folds of one parameter combo run in order; a combo stops early when
+a fold fails (command error, timeout, preflight FAIL) or, if the spec opts in,
+when its running objectives fall below a floor or are Pareto-dominated by
+another combo over the same folds (agent-rules/16_automated_research_loop.md).
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import functools
+import itertools
+import json
+import logging
+import os
+import re
+import shlex
+import signal
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+import project_guard
+from preflight_backtest import run_preflight, write_report
+
+
+LOGGER = logging.getLogger("sweep_runner")
+
+
+RESERVED_PLACEHOLDERS = {"run_id", "fold", "experiment_dir", "results_dir", "params_json"}
+
+
+# Metric key aliases, consistent with preflight_backtest.check_metrics_sanity.
+OBJECTIVE_ALIASES = {
+    "sharpe": {"sharpe", "sharpe_ratio"},
+    "mdd": {"mdd", "max_drawdown"},
+    "vol": {"vol", "volatility", "ann_vol"},
+}
+
+
+NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]*$")
+
+
+@dataclass(frozen=True)
+class Limits:
+    timeout_sec: float | None = None
+    memory_mb: int | None = None  # RLIMIT_AS
+    cpu_sec: int | None = None  # RLIMIT_CPU
+    nice: int = 0
+
+
+@dataclass(frozen=True)
+class SweepSpec:
+    name: str
+    command: str
+    grid: dict[str, list[Any]]
+    folds: list[dict[str, Any]]
+    objectives: dict[str, str]  # metric -> "max" | "min"
+    limits: Limits = Limits()
+    workers: int = 1
+    market_data: str | None = None
+    hypothesis: str = ""
+    max_failures: int | None = 3
+    prune_min_folds: int = 1
+    prune_margin: dict[str, float] = field(default_factory=dict)
+    prune_floor: dict[str, float] | None = None
+    prune_dominated: bool = False
+
+    @classmethod
+    def from_json(cls, raw: dict[str, Any]) -> SweepSpec:
+        for key in ("name", "command", "grid"):
+            if key not in raw:
+                raise ValueError(f"Sweep spec is missing '{key}'")
+        name = str(raw["name"])
+        if not NAME_RE.match(name):
+            raise ValueError(f"Sweep name must match {NAME_RE.pattern}: {name!r}")
+
+        grid = {str(k): (v if isinstance(v, list) else [v]) for k, v in dict(raw["grid"]).items()}
+        if any(not v for v in grid.values()):
+            raise ValueError("Every grid axis needs at least one value")
+        folds = [dict(f) for f in raw.get("folds") or [{}]]
+        fold_keys = set().union(*(f.keys() for f in folds))
+        clash = (set(grid) & fold_keys) | ((set(grid) | fold_keys) & RESERVED_PLACEHOLDERS)
+        if clash:
+            raise ValueError(f"Grid/fold keys clash with each other or reserved names: {sorted(clash)}")
+
+        objectives = {str(k): str(v).lower() for k, v in (raw.get("objectives") or {"sharpe": "max"}).items()}
+        bad = {k: v for k, v in objectives.items() if v not in ("max", "min")}
+        if bad:
+            raise ValueError(f"Objective direction must be 'max' or 'min': {bad}")
+
+        limits_raw = raw.get("limits") or {}
+        prune_raw = raw.get("prune") or {}
+        prune_min_folds = int(prune_raw.get("min_folds", 1))
+        if prune_min_folds < 1:
+            raise ValueError(f"prune.min_folds must be >= 1: {prune_min_folds}")
+        return cls(
+            name=name,
+            command=str(raw["command"]),
+            grid=grid,
+            folds=folds,
+            objectives=objectives,
+            limits=Limits(
+                timeout_sec=limits_raw.get("timeout_sec"),
+                memory_mb=limits_raw.get("memory_mb"),
+                cpu_sec=limits_raw.get("cpu_sec"),
+                nice=int(limits_raw.get("nice", 0)),
+            ),
+            workers=int(raw.get("workers", 1)),
+            market_data=raw.get("market_data"),
+            hypothesis=str(raw.get("hypothesis", "")),
+            max_failures=raw.get("max_failures", 3),
+            prune_min_folds=prune_min_folds,
+            prune_margin={str(k): float(v) for k, v in (prune_raw.get("margin") or {}).items()},
+            prune_floor={str(k): float(v) for k, v in prune_raw["floor"].items()} if prune_raw.get("floor") else None,
+            prune_dominated=bool(prune_raw.get("dominated", False)),
+        )
+
+
+@dataclass(frozen=True)
+class RunJob:
+    run_id: str
+    combo: int
+    fold: int
+    params: dict[str, Any]
+    fold_params: dict[str, Any]
+    experiment_dir: Path
+    command: str
+    project_root: Path
+    limits: Limits
+    market_data: Path | None
+    resume: bool = False
+
+
+@dataclass
+class RunOutcome:
+    run_id: str
+    combo: int
+    fold: int
+    experiment_dir: str
+    status: str  # ok | failed | timeout | preflight_failed | resumed
+    returncode: int | None = None
+    elapsed_sec: float = 0.0  # wall clock
+    cpu_sec: float = 0.0  # user + sys of the command and the children it waited for
+    failed_checks: list[str] = field(default_factory=list)
+    objectives: dict[str, float | None] = field(default_factory=dict)
+
+    @property
+    def passed(self) -> bool:
+        return self.status in ("ok", "resumed")
+
+
+def _configure_logging() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+
+def expand_grid(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def plan_runs(
+    spec: SweepSpec,
+    project_root: Path,
+    date: dt.date,
+    resume: bool = False,
+) -> list[list[RunJob]]:
+    """
+    Return jobs[combo][fold]. Folder names follow the experiments/ convention:
+    YYYY-MM-DD_<sweep>_g<NNN>[_f<K>].
+    """
+    combos = expand_grid(spec.grid)
+    width = max(3, len(str(len(combos))))
+    experiments = project_root / "experiments"
+    market_data = Path(spec.market_data).expanduser() if spec.market_data else None
+    if market_data is not None and not market_data.is_absolute():
+        market_data = project_root / market_data
+
+    jobs: list[list[RunJob]] = []
+    for ci, params in enumerate(combos):
+        row: list[RunJob] = []
+        for fi, fold_params in enumerate(spec.folds):
+            run_id = f"g{ci + 1:0{width}d}" + (f"_f{fi}" if len(spec.folds) > 1 else "")
+            exp_dir = experiments / f"{date.isoformat()}_{spec.name}_{run_id}"
+            if exp_dir.exists() and not resume:
+                raise ValueError(f"Experiment folder already exists (use --resume): {exp_dir}")
+            values = {
+                **params,
+                **fold_params,
+                "run_id": run_id,
+                "fold": fi,
+                "experiment_dir": str(exp_dir),
+                "results_dir": str(exp_dir / "results"),
+                "params_json": json.dumps({**params, **fold_params}, sort_keys=True),
+            }
+            try:
+                command = spec.command.format(**{k: shlex.quote(str(v)) for k, v in values.items()})
+            except (KeyError, IndexError) as e:
+                raise ValueError(f"Command template references an unknown placeholder: {e}") from None
+            row.append(
+                RunJob(
+                    run_id=run_id,
+                    combo=ci,
+                    fold=fi,
+                    params=params,
+                    fold_params=fold_params,
+                    experiment_dir=exp_dir,
+                    command=command,
+                    project_root=project_root,
+                    limits=spec.limits,
+                    market_data=market_data,
+                    resume=resume,
+                )
+            )
+        jobs.append(row)
+    return jobs
+
+
+def _run_readme(spec: SweepSpec, job: RunJob) -> str:
+    lines = [
+        f"# {job.experiment_dir.name}",
+        "",
+        f"- Sweep: `{spec.name}` (run `{job.run_id}`)",
+        f"- Hypothesis: {spec.hypothesis or '(see sweep spec)'}",
+        f"- Params: `{json.dumps(job.params, sort_keys=True)}`",
+    ]
+    if job.fold_params:
+        lines.append(f"- Fold {job.fold}: `{json.dumps(job.fold_params, sort_keys=True)}`")
+    lines += [
+        f"- Command: `{job.command}`",
+        "- Artifacts: `results/`; preflight: `results/preflight_report.json`",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def prepare_run_dir(spec: SweepSpec, job: RunJob) -> None:
+    (job.experiment_dir / "results").mkdir(parents=True, exist_ok=True)
+    (job.experiment_dir / "logs").mkdir(parents=True, exist_ok=True)
+    config = {"sweep": spec.name, "run_id": job.run_id, "params": job.params, "fold": job.fold_params}
+    (job.experiment_dir / "config.json").write_text(json.dumps(config, indent=2), encoding="utf-8")
+    readme = job.experiment_dir / "README.md"
+    if not readme.exists():
+        readme.write_text(_run_readme(spec, job), encoding="utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Execution (runs inside pool worker processes)
+# ---------------------------------------------------------------------------
+
+
+def _apply_limits(limits: Limits) -> None:
+    # preexec_fn: runs in the forked child before exec. Pool workers are single-threaded, so this is safe here.
+    import resource
+
+    if limits.memory_mb:
+        as_bytes = int(limits.memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (as_bytes, as_bytes))
+    if limits.cpu_sec:
+        # SIGXCPU at the soft limit, SIGKILL shortly after.
+        resource.setrlimit(resource.RLIMIT_CPU, (int(limits.cpu_sec), int(limits.cpu_sec) + 5))
+    if limits.nice:
+        os.nice(limits.nice)
+
+
+def read_objectives(experiment_dir: Path, objectives: dict[str, str]) -> dict[str, float | None]:
+    metrics_path = experiment_dir / "results" / "metrics.json"
+    try:
+        metrics: dict[str, Any] = json.loads(metrics_path.read_text(encoding="utf-8"))
+    except Exception:
+        return {k: None for k in objectives}
+
+    lowered = {k.lower(): v for k, v in metrics.items()}
+    out: dict[str, float | None] = {}
+    for key in objectives:
+        names = OBJECTIVE_ALIASES.get(key.lower(), {key.lower()})
+        raw = next((lowered[n] for n in names if n in lowered), None)
+        try:
+            out[key] = float(raw) if raw is not None else None
+        except (TypeError, ValueError):
+            out[key] = None
+    return out
+
+
+def _gate(job: RunJob, objectives: dict[str, str], outcome: RunOutcome) -> RunOutcome:
+    checks = run_preflight(job.experiment_dir, job.market_data)
+    write_report(job.experiment_dir, checks)
+    outcome.failed_checks = [c.name for c in checks if not c.ok]
+    outcome.objectives = read_objectives(job.experiment_dir, objectives)
+    if outcome.failed_checks and outcome.status == "ok":
+        outcome.status = "preflight_failed"
+    return outcome
+
+
+def execute_run(job: RunJob, objectives: dict[str, str]) -> RunOutcome:
+    """
+    Run one backtest command under its resource limits, then preflight it.
+    With resume=True, a run that already has a preflight report is not re-run.
+    """
+    outcome = RunOutcome(job.run_id, job.combo, job.fold, str(job.experiment_dir), status="ok")
+    report_path = job.experiment_dir / "results" / "preflight_report.json"
+    if job.resume and report_path.exists():
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+        outcome.status = "resumed" if report.get("ok") else "preflight_failed"
+        outcome.failed_checks = [c["name"] for c in report.get("checks", []) if not c.get("ok")]
+        outcome.objectives = read_objectives(job.experiment_dir, objectives)
+        return outcome
+
+    env = {
+        **os.environ,
+        "SWEEP_RUN_ID": job.run_id,
+        "SWEEP_EXPERIMENT_DIR": str(job.experiment_dir),
+        "SWEEP_RESULTS_DIR": str(job.experiment_dir / "results"),
+        "SWEEP_PARAMS": json.dumps({**job.params, **job.fold_params}, sort_keys=True),
+    }
+    import resource
+
+    # The worker runs one job at a time, so the RUSAGE_CHILDREN delta is exactly this command.
+    usage0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.perf_counter()
+    with (job.experiment_dir / "logs" / "run.log").open("w", encoding="utf-8") as log:
+        log.write(f"$ {job.command}\n")
+        log.flush()
+        proc = subprocess.Popen(
+            ["/bin/sh", "-c", job.command],
+            cwd=job.project_root,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            preexec_fn=functools.partial(_apply_limits, job.limits),
+            start_new_session=True,
+        )
+        try:
+            outcome.returncode = proc.wait(timeout=job.limits.timeout_sec)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+            outcome.status = "timeout"
+    outcome.elapsed_sec = round(time.perf_counter() - t0, 3)
+    usage1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    outcome.cpu_sec = round(usage1.ru_utime + usage1.ru_stime - usage0.ru_utime - usage0.ru_stime, 3)
+
+    if outcome.status == "ok" and outcome.returncode != 0:
+        outcome.status = "failed"
+    if outcome.status != "ok":
+        return outcome
+    return _gate(job, objectives, outcome)
+
+
+# ---------------------------------------------------------------------------
+# Pruning
+# ---------------------------------------------------------------------------
+
+
+def _means(runs: list[RunOutcome], n: int, objectives: dict[str, str]) -> dict[str, float] | None:
+    """Mean of each objective over the first n folds, sign-flipped so that larger is better."""
+    head = runs[:n]
+    out: dict[str, float] = {}
+    for key, direction in objectives.items():
+        vals = [r.objectives.get(key) for r in head]
+        if len(vals) < n or any(v is None for v in vals):
+            return None
+        mean = sum(vals) / n  # type: ignore[arg-type]
+        out[key] = mean if direction == "max" else -mean
+    return out
+
+
+def prune_reason(
+    spec: SweepSpec,
+    combo: int,
+    completed: dict[int, list[RunOutcome]],
+    eligible: set[int],
+) -> str | None:
+    """
+    Why combo should stop before its next fold, or None to keep it.
+    Only combos in `eligible` (no failed fold) can dominate another.
+    """
+    runs = completed.get(combo, [])
+    if runs and not runs[-1].passed:
+        return f"fold {runs[-1].fold} {runs[-1].status}"
+    n = len(runs)
+    if n < spec.prune_min_folds:
+        return None
+    mine = _means(runs, n, spec.objectives)
+    if mine is None:
+        return "objective missing from metrics.json" if (spec.prune_floor or spec.prune_dominated) else None
+
+    if spec.prune_floor:
+        for key, floor in spec.prune_floor.items():
+            signed_floor = floor if spec.objectives.get(key, "max") == "max" else -floor
+            if key in mine and mine[key] < signed_floor:
+                return f"{key} below floor {floor} after {n} fold(s)"
+
+    if spec.prune_dominated:
+        for other in eligible:
+            if other == combo or len(completed.get(other, [])) < n:
+                continue
+            theirs = _means(completed[other], n, spec.objectives)
+            if theirs is None:
+                continue
+            diffs = [theirs[k] - mine[k] for k in spec.objectives]
+            margins = [spec.prune_margin.get(k, 0.0) for k in spec.objectives]
+            if all(d >= m for d, m in zip(diffs, margins)) and any(d > 0 for d in diffs):
+                return f"dominated by combo {other + 1} over {n} fold(s)"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Scheduling
+# ---------------------------------------------------------------------------
+
+
+def run_sweep(spec: SweepSpec, jobs: list[list[RunJob]], workers: int) -> dict[str, Any]:
+    """
+    Breadth-first over folds: the next job is always the lowest pending fold of a
+    live combo that has nothing in flight, so combos are compared on equal footing.
+    """
+    n_folds = len(spec.folds)
+    completed: dict[int, list[RunOutcome]] = {ci: [] for ci in range(len(jobs))}
+    pruned: dict[int, str] = {}
+    in_flight: dict[Future[RunOutcome], RunJob] = {}
+    failures = 0
+    aborted: str | None = None
+
+    def live(ci: int) -> bool:
+        return ci not in pruned and len(completed[ci]) < n_folds
+
+    def next_job() -> RunJob | None:
+        busy = {j.combo for j in in_flight.values()}
+        ready = [ci for ci in range(len(jobs)) if live(ci) and ci not in busy]
+        if not ready:
+            return None
+        ci = min(ready, key=lambda c: (len(completed[c]), c))
+        return jobs[ci][len(completed[ci])]
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        while True:
+            while aborted is None and len(in_flight) < workers:
+                job = next_job()
+                if job is None:
+                    break
+                prepare_run_dir(spec, job)
+                in_flight[pool.submit(execute_run, job, spec.objectives)] = job
+                LOGGER.info("START | %s | %s", job.run_id, job.command)
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                job = in_flight.pop(fut)
+                try:
+                    outcome = fut.result()
+                except Exception as e:
+                    outcome = RunOutcome(job.run_id, job.combo, job.fold, str(job.experiment_dir), "failed")
+                    LOGGER.exception("Worker error for %s: %s", job.run_id, e)
+                completed[job.combo].append(outcome)
+                level = logging.INFO if outcome.passed else logging.WARNING
+                LOGGER.log(
+                    level,
+                    "%s | %s | %.1fs (cpu %.1fs) | %s%s",
+                    outcome.status.upper(),
+                    outcome.run_id,
+                    outcome.elapsed_sec,
+                    outcome.cpu_sec,
+                    outcome.objectives,
+                    f" | failed={outcome.failed_checks}" if outcome.failed_checks else "",
+                )
+                if outcome.status in ("failed", "timeout"):
+                    failures += 1
+                    if spec.max_failures is not None and failures >= spec.max_failures and aborted is None:
+                        aborted = f"{failures} command failure(s); check logs/run.log"
+                        LOGGER.error("Aborting sweep: %s", aborted)
+
+            # Re-evaluate every live combo: one finished run can make several others dominated.
+            eligible = {ci for ci, runs in completed.items() if runs and all(r.passed for r in runs)}
+            for ci in range(len(jobs)):
+                if not live(ci):
+                    continue
+                reason = prune_reason(spec, ci, completed, eligible)
+                if reason is not None:
+                    pruned[ci] = reason
+                    LOGGER.info(
+                        "PRUNE | combo %d | %s | skipped %d fold(s)", ci + 1, reason, n_folds - len(completed[ci])
+                    )
+
+    return build_summary(spec, jobs, completed, pruned, aborted)
+
+
+def build_summary(
+    spec: SweepSpec,
+    jobs: list[list[RunJob]],
+    completed: dict[int, list[RunOutcome]],
+    pruned: dict[int, str],
+    aborted: str | None,
+) -> dict[str, Any]:
+    n_folds = len(spec.folds)
+    combos: list[dict[str, Any]] = []
+    for ci, row in enumerate(jobs):
+        runs = completed[ci]
+        complete = len(runs) == n_folds and all(r.passed for r in runs)
+        means = _means(runs, len(runs), spec.objectives) if runs and all(r.passed for r in runs) else None
+        if means is not None:
+            means = {k: (v if spec.objectives[k] == "max" else -v) for k, v in means.items()}
+        if complete:
+            status = "complete"
+        elif ci in pruned:
+            status = "pruned"
+        else:
+            status = "not_run" if not runs else "incomplete"
+        combos.append(
+            {
+                "combo": ci + 1,
+                "params": row[0].params,
+                "status": status,
+                "reason": pruned.get(ci),
+                "folds_run": len(runs),
+                "folds_skipped": n_folds - len(runs),
+                "mean_objectives": means,
+                "runs": [asdict(r) for r in runs],
+            }
+        )
+
+    primary, direction = next(iter(spec.objectives.items()))
+    ranked = [
+        c for c in combos if c["status"] == "complete" and (c["mean_objectives"] or {}).get(primary) is not None
+    ]
+    ranked.sort(key=lambda c: c["mean_objectives"][primary], reverse=direction == "max")
+    total = len(jobs) * n_folds
+    executed = sum(c["folds_run"] for c in combos)
+    return {
+        "sweep": spec.name,
+        "objectives": spec.objectives,
+        "folds": spec.folds,
+        "runs_planned": total,
+        "runs_executed": executed,
+        "runs_skipped": total - executed,
+        "run_wall_sec": round(sum(r["elapsed_sec"] for c in combos for r in c["runs"]), 3),
+        "run_cpu_sec": round(sum(r["cpu_sec"] for c in combos for r in c["runs"]), 3),
+        "aborted": aborted,
+        "best": ranked[0] if ranked else None,
+        "combos": combos,
+    }
+
+
+def render_report_md(summary: dict[str, Any]) -> str:
+    keys = list(summary["objectives"])
+    lines = [
+        f"# Sweep: {summary['sweep']}",
+        "",
+        f"- Runs: {summary['runs_executed']}/{summary['runs_planned']} executed, "
+        f"{summary['runs_skipped']} skipped by early stopping",
+        f"- Aborted: {summary['aborted'] or 'no'}",
+        f"- Run time (sum over runs): {summary['run_wall_sec']:.1f}s wall, {summary['run_cpu_sec']:.1f}s CPU",
+    ]
+    best = summary["best"]
+    if best is not None:
+        lines.append(f"- Best: combo {best['combo']} `{json.dumps(best['params'], sort_keys=True)}`")
+    lines += [
+        "",
+        "| Combo | Params | " + " | ".join(keys) + " | Folds | Status |",
+        "|---|---|" + "---|" * len(keys) + "---|---|",
+    ]
+    for c in summary["combos"]:
+        means = c["mean_objectives"] or {}
+        vals = [f"{means[k]:.4g}" if means.get(k) is not None else "-" for k in keys]
+        status = c["status"] + (f" ({c['reason']})" if c["reason"] else "")
+        lines.append(
+            f"| {c['combo']} | `{json.dumps(c['params'], sort_keys=True)}` | "
+            + " | ".join(vals)
+            + f" | {c['folds_run']}/{c['folds_run'] + c['folds_skipped']} | {status} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def _main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run a parameter grid / walk-forward sweep with preflight gating and early stopping."
+    )
+    parser.add_argument("spec", type=Path, help="Sweep spec JSON (name, command, grid, [folds], [objectives], ...)")
+    parser.add_argument(
+        "--project-root", type=Path, default=Path.cwd(), help="Project containing experiments/ (default: cwd)"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Parallel runs (default: spec 'workers' or 1)")
+    parser.add_argument(
+        "--date", type=dt.date.fromisoformat, default=None, help="Date prefix for folders (default: today)"
+    )
+    parser.add_argument("--resume", action="store_true", help="Reuse runs that already have a preflight report")
+    parser.add_argument("--dry-run", action="store_true", help="Print planned folders and commands; run nothing")
+    args = parser.parse_args()
+
+    project_root = args.project_root.expanduser().resolve()
+    if not project_root.is_dir():
+        LOGGER.error("Invalid project_root: %s", project_root)
+        return 1
+
+    spec = SweepSpec.from_json(json.loads(args.spec.read_text(encoding="utf-8")))
+    date = args.date or dt.date.today()
+    jobs = plan_runs(spec, project_root, date, resume=args.resume)
+    workers = args.workers or spec.workers
+    LOGGER.info(
+        "Sweep %s: %d combo(s) x %d fold(s), workers=%d", spec.name, len(jobs), len(spec.folds), workers
+    )
+
+    if args.dry_run:
+        for row in jobs:
+            for job in row:
+                print(f"{job.experiment_dir.relative_to(project_root)}\t{job.command}")
+        return 0
+
+    project_guard.ensure_dirs(project_root)
+    project_guard.ensure_experiment_readme_stub(project_root)
+
+    t0 = time.perf_counter()
+    summary = run_sweep(spec, jobs, workers)
+    summary["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+
+    report_dir = project_root / "experiments" / f"{date.isoformat()}_{spec.name}_sweep"
+    report_dir.mkdir(parents=True, exist_ok=True)
+    (report_dir / "report.json").write_text(json.dumps(summary, indent=2, default=str), encoding="utf-8")
+    (report_dir / "REPORT.md").write_text(render_report_md(summary), encoding="utf-8")
+
+    best = summary["best"]
+    LOGGER.info(
+        "Sweep done in %.2fs: executed=%d skipped=%d best=%s",
+        summary["elapsed_sec"],
+        summary["runs_executed"],
+        summary["runs_skipped"],
+        f"combo {best['combo']} {best['mean_objectives']}" if best else "none",
+    )
+    LOGGER.info("Wrote report: %s", report_dir / "report.json")
+    return 2 if summary["aborted"] or best is None else 0
+
+
+def main() -> int:
+    _configure_logging()
+    try:
+        return _main()
+    except ValueError as e:
+        LOGGER.error("%s", e)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())